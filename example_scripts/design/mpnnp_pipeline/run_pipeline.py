@@ -44,12 +44,8 @@ import sys
 import subprocess
 import argparse
 import shutil
-import string
-import re
 import json
 from pathlib import Path
-import numpy as np
-import pandas as pd
 
 # ================================
 # HARDCODED CONFIGURATION
@@ -72,43 +68,61 @@ LIGANDMPNN_BATCH_SIZE = 16
 LIGANDMPNN_NUM_BATCHES = 4
 LIGANDMPNN_OMIT_AA = "C"
 
+# FASTA extensions stripped when deriving the job name
+FASTA_EXTENSIONS = ('.fa', '.fasta', '.faa')
+
 # ColabFold parameters
 COLABFOLD_MODEL_ORDER = 3
 COLABFOLD_NUM_MODELS = 1
 COLABFOLD_NUM_RECYCLE = 6
 
+# RMSD analysis settings
+RMSD_CHUNK_SIZE = 500  # Predicted structures per comparison array task
+
 # SLURM settings
 SLURM_PARTITION_CPU = "low"
 SLURM_PARTITION_GPU = "gpu-a100"
 SLURM_ACCOUNT_GPU = "genome-center-grp"
 
+# Resolved once so each submission skips the PATH lookup
+_SBATCH = shutil.which("sbatch") or "sbatch"
+_SCANCEL = shutil.which("scancel") or "scancel"
+
 # ================================
 # UTILITY FUNCTIONS
 # ================================
 
+def write_script(script_file, script_content):
+    """Write a generated SLURM script in a single write, created executable."""
+    fd = os.open(script_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o755)
+    try:
+        os.write(fd, script_content.encode())
+    finally:
+        os.close(fd)
+
 def validate_fasta(fasta_path):
     """Validate that the input FASTA file exists and is valid."""
-    if not os.path.isfile(fasta_path):
+    # Open directly instead of stat-ing first; only the header byte is needed
+    try:
+        with open(fasta_path, 'rb') as f:
+            first = f.read(1)
+    except (FileNotFoundError, IsADirectoryError):
         print(f"[ERROR] ERROR: FASTA file not found: {fasta_path}")
         return False
 
     # Basic FASTA validation
-    with open(fasta_path, 'r') as f:
-        content = f.read()
-        if not content.startswith('>'):
-            print(f"[ERROR] ERROR: Invalid FASTA format (missing header)")
-            return False
+    if first != b'>':
+        print(f"[ERROR] ERROR: Invalid FASTA format (missing header)")
+        return False
 
     return True
 
 def get_sequence_length(fasta_path):
     """Get the length of the sequence in a FASTA file."""
     with open(fasta_path, 'r') as f:
-        lines = f.readlines()
-
-    # Skip header and concatenate sequence lines
-    sequence = ''.join(line.strip() for line in lines[1:] if not line.startswith('>'))
-    return len(sequence)
+        # Skip header and sum sequence line lengths
+        next(f, None)
+        return sum(len(line.strip()) for line in f if not line.startswith('>'))
 
 def validate_fixed_residues(fixed_residues_str, chain, sequence_length):
     """
@@ -159,8 +173,11 @@ def get_job_name(fasta_path):
     """Extract job name from FASTA filename."""
     basename = os.path.basename(fasta_path)
     # Remove extension (.fa, .fasta, .faa)
-    job_name = re.sub(r'\.(fa|fasta|faa)$', '', basename, flags=re.IGNORECASE)
-    return job_name
+    lower = basename.lower()
+    for ext in FASTA_EXTENSIONS:
+        if lower.endswith(ext):
+            return basename[:-len(ext)]
+    return basename
 
 def setup_job_directory(base_dir, job_name):
     """Create the job directory structure."""
@@ -175,8 +192,13 @@ def setup_job_directory(base_dir, job_name):
         "cache"
     ]
 
+    # Create the job root once; each subdirectory is then a single mkdir
+    os.makedirs(job_dir, exist_ok=True)
     for subdir in subdirs:
-        os.makedirs(os.path.join(job_dir, subdir), exist_ok=True)
+        try:
+            os.mkdir(os.path.join(job_dir, subdir))
+        except FileExistsError:
+            pass
 
     print(f"[OK] Created job directory: {job_dir}")
     return job_dir
@@ -186,19 +208,13 @@ def copy_input_fasta(source_fasta, job_dir, job_name):
     dest_fasta = os.path.join(job_dir, "input.fa")
 
     # Read source and write with proper header
-    with open(source_fasta, 'r') as infile:
-        lines = infile.readlines()
+    lines = Path(source_fasta).read_text().splitlines(keepends=True)
 
-    with open(dest_fasta, 'w') as outfile:
-        # Ensure header is properly formatted
-        if lines[0].startswith('>'):
-            outfile.write(f">{job_name}\n")
-        else:
-            outfile.write(f">{job_name}\n")
+    # Replace any existing header with the job name
+    if lines and lines[0].startswith('>'):
+        lines = lines[1:]
 
-        # Write sequence lines
-        for line in lines[1:] if lines[0].startswith('>') else lines:
-            outfile.write(line)
+    Path(dest_fasta).write_text(f">{job_name}\n" + ''.join(lines))
 
     print(f"[OK] Copied input FASTA to: {dest_fasta}")
     return dest_fasta
@@ -255,8 +271,7 @@ hhblits -cpu 4 -i {current_input} \\
     -realign_max 20000
 """
 
-        with open(script_file, 'w') as f:
-            f.write(script_content)
+        write_script(script_file, script_content)
 
         scripts.append(script_file)
         current_input = a3m_file  # Chain outputs
@@ -301,8 +316,7 @@ hhfilter \\
     -o {output_a3m}
 """
 
-    with open(script_file, 'w') as f:
-        f.write(script_content)
+    write_script(script_file, script_content)
 
     print(f"[OK] Generated HHfilter script")
     return script_file
@@ -323,6 +337,11 @@ def create_conservation_script(job_dir, job_name, conservation_threshold):
 #SBATCH --time=0:10:00
 #SBATCH --requeue
 
+# Size NumPy's thread pools to the allocation, not the node
+export OMP_NUM_THREADS=$SLURM_CPUS_PER_TASK
+export OPENBLAS_NUM_THREADS=$SLURM_CPUS_PER_TASK
+export MKL_NUM_THREADS=$SLURM_CPUS_PER_TASK
+
 module load conda/latest
 eval "$(conda shell.bash hook)"
 conda activate {BASE_CONDA_ENV}
@@ -334,49 +353,47 @@ import os
 import sys
 import numpy as np
 import pandas as pd
-import string
+
+ALPHABET = np.frombuffer(b"ARNDCQEGHILKMFPSTWYV-", dtype=np.uint8)
+
+# Byte -> alphabet index lookup; anything outside the alphabet maps to gap (20)
+LUT = np.full(256, 20, dtype=np.uint8)
+LUT[ALPHABET] = np.arange(ALPHABET.shape[0], dtype=np.uint8)
 
 def parse_a3m(filename):
     \"\"\"Parse A3M file and convert to numeric format.\"\"\"
     lab, seq = [], []
 
-    with open(filename, "r") as f:
-        for line in f:
-            if line[0] == '>':
-                lab.append(line.split()[0][1:])
-                seq.append("")
-            else:
-                seq[-1] += line.rstrip()
-
-    msa, ins = [], []
-    table = str.maketrans(dict.fromkeys(string.ascii_lowercase))
-    nrow, ncol = len(seq), len(seq[0])
+    with open(filename, "rb") as f:
+        data = f.read()
 
-    for seqi in seq:
-        msa.append(seqi.translate(table))
-        a = np.array([0 if c.isupper() or c == '-' else 1 for c in seqi])
-        i = np.zeros((ncol))
+    # One iteration per record rather than per line; split() drops newlines
+    for record in data[1:].split(b"\\n>"):
+        header, _, body = record.partition(b"\\n")
+        lab.append(header.split()[0].decode())
+        seq.append(b"".join(body.split()))
 
-        if np.sum(a) > 0:
-            pos = np.where(a == 1)[0]
-            a = pos - np.arange(pos.shape[0])
-            pos, num = np.unique(a, return_counts=True)
-            i[pos[pos < ncol]] = num[pos < ncol]
+    nrow = len(seq)
 
-        ins.append(i)
+    # Classify every residue of every row at once; lowercase letters are insertions
+    buf = np.frombuffer(b"".join(seq), dtype=np.uint8)
+    is_ins = (buf >= 0x61) & (buf <= 0x7A)
 
-    alphabet = np.array(list("ARNDCQEGHILKMFPSTWYV-"), dtype='|S1').view(np.uint8)
-    msa_arr = np.array([list(s) for s in msa], dtype='|U1')
-    msa_num = msa_arr.copy().astype('|S1').view(np.uint8)
+    msa_num = LUT[buf[~is_ins]].reshape(nrow, -1)
+    ncol = msa_num.shape[1]
 
-    for idx in range(alphabet.shape[0]):
-        msa_num[msa_num == alphabet[idx]] = idx
+    # Each insertion is attributed to the aligned column that follows it. Its
+    # aligned offset is its position minus the insertions before it, so only
+    # the insertion positions are materialized, not a per-residue index.
+    pos = np.flatnonzero(is_ins)
+    row = np.searchsorted(np.cumsum([len(s) for s in seq]), pos, side='right')
+    col = pos - np.arange(pos.shape[0]) - row * ncol
+    keep = col < ncol
+    ins = np.bincount(row[keep] * ncol + col[keep], minlength=nrow * ncol)
+    ins = ins.reshape(nrow, ncol).astype(np.uint8)
 
-    msa_arr[msa_num > 20] = '-'
-    msa_num[msa_num > 20] = 20
-    ins = np.array(ins, dtype=np.uint8)
-
-    return {{"msa": msa_arr, "msa_num": msa_num, "labels": lab, "insertions": ins}}
+    # Characters are not materialized; ALPHABET[msa_num] decodes them if needed
+    return {{"msa_num": msa_num, "labels": lab, "insertions": ins}}
 
 # Find filtered MSA
 msa_file = "{hhblits_dir}/{job_name}_id{HHFILTER_PARAMS['id']}cov{HHFILTER_PARAMS['cov']}qid{HHFILTER_PARAMS['qid']}.a3m"
@@ -391,22 +408,34 @@ aln = parse_a3m(msa_file)
 msa_num = aln["msa_num"]
 L = msa_num.shape[1]
 
-counts = np.stack([np.bincount(col, minlength=21) for col in msa_num.T]).T
+# Per-column residue counts (21 x L) from a bincount over column-offset codes.
+# Rows are processed in blocks so the int64 index temporary stays around
+# 64 MB even for deep MSAs; small MSAs are handled in a single block.
+offsets = np.arange(L, dtype=np.int64) * 21
+block = max(1, (1 << 23) // L)
+counts = np.zeros(21 * L, dtype=np.uint32)
+for start in range(0, msa_num.shape[0], block):
+    counts += np.bincount((msa_num[start:start + block] + offsets).ravel(), minlength=21 * L).astype(np.uint32)
+counts = counts.reshape(L, 21).T
 max_count = np.max(counts, axis=0)
 
 # Calculate conservation at specified threshold
 frac = {conservation_threshold}
-freq = counts / msa_num.shape[0]
-freq_norm = freq[:20] / freq[:20].sum(axis=0)
+# Amino-acid frequencies normalized over the 20 residues; the 1/N row
+# normalization cancels out, so work from the counts directly in float32
+aa_counts = counts[:20].astype(np.float32)
+freq_norm = aa_counts / aa_counts.sum(axis=0)
 max_freq_norm = np.max(freq_norm, axis=0)
 max_freq_norm[max_count < 10] = 0
 
 n_keep = int(L * frac)
-conserved = np.argsort(max_freq_norm)[::-1][:n_keep] + 1  # 1-based indexing
+# Partial selection of the n_keep most conserved columns (no full sort needed)
+top = np.argpartition(max_freq_norm, L - n_keep)[L - n_keep:] if n_keep else np.array([], dtype=np.intp)
+conserved = np.sort(top) + 1  # 1-based indexing
 
 results = {{
     "fraction_conserved": [f"{{int(frac*100)}}%"],
-    "residue_list": [",".join(map(str, np.sort(conserved).tolist()))]
+    "residue_list": [",".join(map(str, conserved.tolist()))]
 }}
 
 df = pd.DataFrame(results)
@@ -418,8 +447,7 @@ print(f"[STATS] Found {{len(conserved)}} conserved residues at {{int(frac*100)}}
 PYTHON_SCRIPT
 """
 
-    with open(script_file, 'w') as f:
-        f.write(script_content)
+    write_script(script_file, script_content)
 
     print(f"[OK] Generated conservation analysis script")
     return script_file
@@ -452,6 +480,8 @@ def create_reference_colabfold_script(job_dir, job_name, input_fasta):
 
 module unload cuda 2>/dev/null || true
 
+export OMP_NUM_THREADS=$SLURM_CPUS_PER_TASK
+
 export MPLBACKEND=Agg
 unset DISPLAY
 export QT_QPA_PLATFORM=offscreen
@@ -460,8 +490,7 @@ export PATH="{COLABFOLD_BIN_PATH}:$PATH"
 colabfold_batch --model-order {COLABFOLD_MODEL_ORDER} --num-models {COLABFOLD_NUM_MODELS} --num-recycle {COLABFOLD_NUM_RECYCLE} {input_fasta} {ref_output}
 """
 
-    with open(script_file, 'w') as f:
-        f.write(script_content)
+    write_script(script_file, script_content)
 
     print(f"[OK] Generated reference ColabFold script")
     return script_file
@@ -470,8 +499,8 @@ colabfold_batch --model-order {COLABFOLD_MODEL_ORDER} --num-models {COLABFOLD_NU
 # LIGANDMPNN DESIGN
 # ================================
 
-def create_ligandmpnn_scripts(job_dir, job_name, design_chain, temperatures, batch_size, num_batches, fixed_residues, conservation_threshold):
-    """Generate LigandMPNN design scripts for all temperatures."""
+def create_ligandmpnn_array_script(job_dir, job_name, design_chain, temperatures, batch_size, num_batches, fixed_residues, conservation_threshold):
+    """Generate a LigandMPNN array script with one task per temperature."""
     ligandmpnn_dir = os.path.join(job_dir, "ligandmpnn")
     logs_dir = os.path.join(job_dir, "logs")
     cache_dir = os.path.join(job_dir, "cache")
@@ -481,18 +510,20 @@ def create_ligandmpnn_scripts(job_dir, job_name, design_chain, temperatures, bat
     # We'll use a glob pattern since the exact name depends on ColabFold
     ref_pdb_pattern = f"{ref_dir}/colabfold_output/*_unrelaxed_rank_001*.pdb"
 
-    scripts = []
-
     for temp in temperatures:
         temp_dir = os.path.join(ligandmpnn_dir, f"T{temp}")
-        os.makedirs(temp_dir, exist_ok=True)
+        try:
+            os.mkdir(temp_dir)
+        except FileExistsError:
+            pass
 
-        script_file = os.path.join(ligandmpnn_dir, f"ligandmpnn_T{temp}.sh")
+    script_file = os.path.join(ligandmpnn_dir, "ligandmpnn_array.sh")
 
-        script_content = f"""#!/bin/bash
-#SBATCH --job-name=lmpnn_{job_name}_T{temp}
-#SBATCH --output={logs_dir}/ligandmpnn_T{temp}_%j.out
-#SBATCH --error={logs_dir}/ligandmpnn_T{temp}_%j.err
+    # Array task N (1-based) designs at the Nth temperature
+    script_content = f"""#!/bin/bash
+#SBATCH --job-name=lmpnn_{job_name}
+#SBATCH --output={logs_dir}/ligandmpnn_%A_%a.out
+#SBATCH --error={logs_dir}/ligandmpnn_%A_%a.err
 #SBATCH --partition={SLURM_PARTITION_GPU}
 #SBATCH --account={SLURM_ACCOUNT_GPU}
 #SBATCH --gres=gpu:1
@@ -508,6 +539,10 @@ conda activate {LIGANDMPNN_CONDA_ENV}
 
 cd {LIGANDMPNN_ROOT}
 
+TEMPS=({' '.join(str(t) for t in temperatures)})
+TEMP=${{TEMPS[$((SLURM_ARRAY_TASK_ID - 1))]}}
+echo "[OK] Designing at temperature $TEMP"
+
 # Find reference PDB
 REF_PDB=$(ls {ref_pdb_pattern} 2>/dev/null | head -1)
 
@@ -563,22 +598,19 @@ eval python run.py \\
     --model_type ligand_mpnn \\
     --checkpoint_ligand_mpnn {LIGANDMPNN_CHECKPOINT} \\
     --pdb_path "$REF_PDB" \\
-    --out_folder {temp_dir} \\
+    --out_folder {ligandmpnn_dir}/T$TEMP \\
     --chains_to_design {design_chain} \\
     $FIXED_ARG \\
-    --temperature {temp} \\
+    --temperature $TEMP \\
     --batch_size {batch_size} \\
     --omit_AA "{LIGANDMPNN_OMIT_AA}" \\
     --number_of_batches {num_batches}
 """
 
-        with open(script_file, 'w') as f:
-            f.write(script_content)
-
-        scripts.append(script_file)
+    write_script(script_file, script_content)
 
-    print(f"[OK] Generated {len(scripts)} LigandMPNN scripts")
-    return scripts
+    print(f"[OK] Generated LigandMPNN array script ({len(temperatures)} temperatures)")
+    return script_file
 
 def create_ligandmpnn_postprocess_script(job_dir, job_name, design_chain, temperatures):
     """Generate post-processing script to split LigandMPNN outputs."""
@@ -671,8 +703,7 @@ with open(cf_tasks_path, "w") as cf_tasks_file:
                 fasta_path = os.path.join(temp_fastas_dir, fasta_filename)
 
                 with open(fasta_path, "w") as fasta_file:
-                    fasta_file.write(new_header + "\\n")
-                    fasta_file.write(chain_seq + "\\n")
+                    fasta_file.write(f"{{new_header}}\\n{{chain_seq}}\\n")
 
                 cf_tasks_file.write(str(fasta_path) + "\\n")
                 total_written += 1
@@ -682,8 +713,7 @@ print(f"[OK] cf_tasks.txt written to: {{cf_tasks_path}}")
 PYTHON_SCRIPT
 """
 
-    with open(script_file, 'w') as f:
-        f.write(script_content)
+    write_script(script_file, script_content)
 
     print(f"[OK] Generated post-processing script")
     return script_file
@@ -711,13 +741,20 @@ def create_colabfold_monomer_script(job_dir, job_name):
 #SBATCH --partition={SLURM_PARTITION_GPU}
 #SBATCH --account={SLURM_ACCOUNT_GPU}
 #SBATCH --gres=gpu:1
+#SBATCH --gpu-bind=closest
 #SBATCH --ntasks=1
 #SBATCH --cpus-per-task=16
+#SBATCH --hint=nomultithread
 #SBATCH --mem=32G
 #SBATCH --time=17:00:00
 
 module unload cuda 2>/dev/null || true
 
+# Keep feature-processing threads on the cores bound next to the GPU
+export OMP_NUM_THREADS=$SLURM_CPUS_PER_TASK
+export OMP_PLACES=cores
+export OMP_PROC_BIND=close
+
 export MPLBACKEND=Agg
 unset DISPLAY
 export QT_QPA_PLATFORM=offscreen
@@ -728,152 +765,330 @@ CF_PATHS=$(sed -n ${{SLURM_ARRAY_TASK_ID}}p {cf_tasks_path})
 colabfold_batch --model-order {COLABFOLD_MODEL_ORDER} --num-models {COLABFOLD_NUM_MODELS} --num-recycle {COLABFOLD_NUM_RECYCLE} "$CF_PATHS" {colabfold_output}
 """
 
-    with open(script_file, 'w') as f:
-        f.write(script_content)
+    write_script(script_file, script_content)
 
     print(f"[OK] Generated ColabFold monomer script")
     return script_file
 
+def create_colabfold_launcher_script(job_dir, job_name, colabfold_script, pymol_script, merge_script):
+    """Generate the job that sizes and submits the ColabFold array once cf_tasks.txt exists."""
+    colabfold_dir = os.path.join(job_dir, "colabfold")
+    ligandmpnn_dir = os.path.join(job_dir, "ligandmpnn")
+    logs_dir = os.path.join(job_dir, "logs")
+
+    parts_dir = os.path.join(job_dir, "pymol_analysis", "parts")
+
+    cf_tasks_path = os.path.join(ligandmpnn_dir, "cf_tasks.txt")
+    script_file = os.path.join(colabfold_dir, "submit_colabfold.sh")
+
+    script_content = f"""#!/bin/bash
+#SBATCH --job-name=cfsub_{job_name}
+#SBATCH --output={logs_dir}/colabfold_submit_%j.out
+#SBATCH --error={logs_dir}/colabfold_submit_%j.err
+#SBATCH --partition={SLURM_PARTITION_CPU}
+#SBATCH --cpus-per-task=1
+#SBATCH --mem=1G
+#SBATCH --time=0:10:00
+
+set -euo pipefail
+
+NUM_TASKS=$(wc -l < {cf_tasks_path})
+
+if [ "$NUM_TASKS" -eq 0 ]; then
+    echo "[ERROR] ERROR: No sequences in {cf_tasks_path}"
+    exit 1
+fi
+
+CF_JOB_ID=$(sbatch --parsable --array=1-$NUM_TASKS {colabfold_script})
+echo "[OK] Submitted ColabFold array job $CF_JOB_ID ($NUM_TASKS tasks)"
+
+# Clear partial RMSD results left over from a previous run
+rm -f {parts_dir}/part_*.csv
+
+NUM_CHUNKS=$(( (NUM_TASKS + {RMSD_CHUNK_SIZE} - 1) / {RMSD_CHUNK_SIZE} ))
+PYMOL_JOB_ID=$(sbatch --parsable --array=1-$NUM_CHUNKS --dependency=afterok:$CF_JOB_ID {pymol_script})
+echo "[OK] Submitted RMSD comparison array job $PYMOL_JOB_ID ($NUM_CHUNKS tasks)"
+
+MERGE_JOB_ID=$(sbatch --parsable --dependency=afterok:$PYMOL_JOB_ID {merge_script})
+echo "[OK] Submitted RMSD merge job $MERGE_JOB_ID"
+"""
+
+    write_script(script_file, script_content)
+
+    print(f"[OK] Generated ColabFold launcher script")
+    return script_file
+
 # ================================
 # PYMOL COMPARISON
 # ================================
 
+# Standalone analysis run by each comparison array task. Kept as a plain
+# string (not an f-string) since every setting arrives on the command line.
+RMSD_ANALYSIS_CODE = """\
+#!/usr/bin/env python3
+\"\"\"CA RMSD of one slice of ColabFold predictions against the reference.\"\"\"
+import os
+import sys
+import re
+import csv
+import fnmatch
+import argparse
+import multiprocessing as mp
+import numpy as np
+
+# Prediction names look like jobname_T0.1_id_10_unrelaxed...
+NAME_PAT = re.compile(r"_T([^_]+?)_id_(\\d+)_")
+
+def ca_coords(pdb_path, chain):
+    \"\"\"Read CA coordinates of one chain from a PDB file as an (N, 3) array.\"\"\"
+    xyz = []
+    with open(pdb_path) as f:
+        for line in f:
+            if line.startswith("ATOM") and line[12:16] == " CA " and line[21] == chain and line[16] in " A":
+                xyz.append((float(line[30:38]), float(line[38:46]), float(line[46:54])))
+    return np.asarray(xyz, dtype=np.float64)
+
+def batch_kabsch_rmsd(ref_xyz, pred_stack):
+    \"\"\"Untrimmed RMSDs after optimal superposition (Kabsch) of K predictions.
+
+    pred_stack is (K, N, 3) and ref_xyz is (N, 3); all K 3x3 SVDs run in one
+    broadcast LAPACK call.
+    \"\"\"
+    P = pred_stack - pred_stack.mean(axis=1, keepdims=True)
+    Q = ref_xyz - ref_xyz.mean(axis=0)
+    U, S, Vt = np.linalg.svd(np.einsum('kni,nj->kij', P, Q))
+    V = Vt.transpose(0, 2, 1)
+    Ut = U.transpose(0, 2, 1)
+
+    # Flip the last axis where needed so R is a rotation, not a reflection
+    D = np.broadcast_to(np.eye(3), V.shape).copy()
+    D[:, 2, 2] = np.sign(np.linalg.det(V @ Ut))
+    R = V @ D @ Ut
+
+    aligned = np.einsum('kni,kji->knj', P, R)
+    return np.sqrt(np.mean(np.sum((aligned - Q) ** 2, axis=2), axis=1))
+
+def rank1_pdbs(directory):
+    \"\"\"Sorted paths of the rank-1 ColabFold models in a directory.\"\"\"
+    try:
+        with os.scandir(directory) as entries:
+            return sorted(e.path for e in entries
+                          if e.is_file() and fnmatch.fnmatchcase(e.name, "*_unrelaxed_rank_001*.pdb"))
+    except FileNotFoundError:
+        return []
+
+def n_cpus():
+    \"\"\"CPUs this process may run on (the SLURM allocation, not the whole node).\"\"\"
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return int(os.environ.get("SLURM_CPUS_PER_TASK", 1))
+
+_N_REF = None
+_CHAIN = None
+
+def _init_worker(n_ref, chain):
+    \"\"\"Give each worker the reference CA count and design chain.\"\"\"
+    global _N_REF, _CHAIN
+    _N_REF = n_ref
+    _CHAIN = chain
+
+def _parse_one(pred_pdb):
+    \"\"\"Read one prediction's CA coordinates; returns (path, xyz, error).\"\"\"
+    try:
+        xyz = ca_coords(pred_pdb, _CHAIN)
+    except Exception as e:
+        return pred_pdb, None, f"{os.path.basename(pred_pdb)}: {e}"
+
+    if xyz.shape[0] != _N_REF:
+        return pred_pdb, None, (f"{os.path.basename(pred_pdb)}: CA count mismatch: "
+                                f"reference {_N_REF}, predicted {xyz.shape[0]}")
+
+    return pred_pdb, xyz, None
+
+def main():
+    parser = argparse.ArgumentParser(description="CA RMSD of ColabFold predictions against a reference")
+    parser.add_argument("--ref-dir", required=True)
+    parser.add_argument("--pred-dir", required=True)
+    parser.add_argument("--chain", required=True)
+    parser.add_argument("--parts-dir", required=True)
+    parser.add_argument("--chunk-size", type=int, required=True)
+    args = parser.parse_args()
+
+    # Find reference PDB
+    ref_pdbs = rank1_pdbs(args.ref_dir)
+
+    if not ref_pdbs:
+        print(f"[ERROR] ERROR: No reference PDB found in {args.ref_dir}")
+        sys.exit(1)
+
+    ref_pdb = ref_pdbs[0]
+    print(f"[ANALYZING] Reference: {os.path.basename(ref_pdb)}")
+
+    # Reference coordinates are parsed once and reused for every comparison
+    ref_xyz = ca_coords(ref_pdb, args.chain)
+
+    if ref_xyz.shape[0] == 0:
+        print(f"[ERROR] ERROR: No CA atoms for chain {args.chain} in {ref_pdb}")
+        sys.exit(1)
+
+    # Find all predicted structures and take this array task's slice
+    pred_pdbs = rank1_pdbs(args.pred_dir)
+
+    if not pred_pdbs:
+        print(f"[ERROR] ERROR: No predicted structures found in {args.pred_dir}")
+        sys.exit(1)
+
+    task_id = int(os.environ.get("SLURM_ARRAY_TASK_ID", 1))
+    start = (task_id - 1) * args.chunk_size
+    pred_pdbs = pred_pdbs[start:start + args.chunk_size]
+
+    print(f"[STATS] Task {task_id}: {len(pred_pdbs)} predicted structures to analyze")
+
+    # Perform batch comparison across the allocated CPUs
+    n_workers = n_cpus()
+    paths = []
+    coords = []
+
+    # PDB parsing is spread over the workers; the superpositions are then
+    # done for the whole slice at once
+    with mp.get_context("fork").Pool(n_workers, initializer=_init_worker,
+                                     initargs=(ref_xyz.shape[0], args.chain)) as pool:
+        for i, (pred_pdb, xyz, error) in enumerate(pool.imap_unordered(_parse_one, pred_pdbs, chunksize=32), 1):
+            if i % 10 == 0:
+                print(f"  Processing {i}/{len(pred_pdbs)}...")
+
+            if error:
+                print(f"[WARNING]  Error processing {error}")
+                continue
+
+            paths.append(pred_pdb)
+            coords.append(xyz)
+
+    rmsds = batch_kabsch_rmsd(ref_xyz, np.stack(coords)) if coords else []
+
+    # Rows are written unsorted; the merge job orders them by RMSD
+    part_csv = os.path.join(args.parts_dir, f"part_{task_id:04d}.csv")
+    with open(part_csv, 'w', newline='', buffering=1 << 20) as csvfile:
+        writer = csv.writer(csvfile)
+        for pred_pdb, rmsd in zip(paths, rmsds):
+            basename = os.path.basename(pred_pdb)
+
+            # Parse temperature and ID from filename
+            m = NAME_PAT.search(basename)
+            temp, seq_id = m.groups() if m else (None, None)
+
+            writer.writerow((basename, temp, seq_id, args.chain, round(float(rmsd), 3), pred_pdb))
+
+    print(f"[OK] Wrote {len(paths)} results to {part_csv}")
+
+if __name__ == "__main__":
+    main()
+"""
+
 def create_pymol_comparison_script(job_dir, job_name, design_chain):
-    """Generate PyMOL RMSD comparison script."""
+    """Generate CA RMSD comparison array script (NumPy Kabsch superposition).
+
+    Each array task runs pymol_rmsd.py on one RMSD_CHUNK_SIZE slice of the
+    predicted structures and writes a partial CSV for the merge job.
+    """
     pymol_dir = os.path.join(job_dir, "pymol_analysis")
+    parts_dir = os.path.join(pymol_dir, "parts")
     colabfold_dir = os.path.join(job_dir, "colabfold", "colabfold_output")
     ref_dir = os.path.join(job_dir, "reference", "colabfold_output")
     logs_dir = os.path.join(job_dir, "logs")
 
-    os.makedirs(pymol_dir, exist_ok=True)
+    os.makedirs(parts_dir, exist_ok=True)
 
-    # Output CSV path
-    output_csv = os.path.join(pymol_dir, f"{job_name}_rmsd_results.csv")
+    analysis_file = os.path.join(pymol_dir, "pymol_rmsd.py")
+    write_script(analysis_file, RMSD_ANALYSIS_CODE)
 
     script_file = os.path.join(pymol_dir, "pymol_comparison.sh")
 
     script_content = f"""#!/bin/bash
 #SBATCH --job-name=pymol_{job_name}
-#SBATCH --output={logs_dir}/pymol_comparison_%j.out
-#SBATCH --error={logs_dir}/pymol_comparison_%j.err
+#SBATCH --output={logs_dir}/pymol_comparison_%A_%a.out
+#SBATCH --error={logs_dir}/pymol_comparison_%A_%a.err
 #SBATCH --partition={SLURM_PARTITION_CPU}
 #SBATCH --cpus-per-task=4
 #SBATCH --mem=16G
 #SBATCH --time=2:00:00
 
+# Parallelism comes from the worker processes; keep each one's BLAS single-threaded
+export OMP_NUM_THREADS=1
+export OPENBLAS_NUM_THREADS=1
+export MKL_NUM_THREADS=1
+
 module load conda/latest
 eval "$(conda shell.bash hook)"
-conda activate /quobyte/jbsiegelgrp/aian/scripts/.conda/envs/ai_docking
+conda activate {BASE_CONDA_ENV}
 
 cd {job_dir}
 
-python3 <<'PYTHON_SCRIPT'
-import os
-import sys
-import csv
-from pathlib import Path
-
-# PyMOL import
-try:
-    from pymol import cmd
-except ImportError:
-    print("[ERROR] ERROR: PyMOL not available!")
-    print("Please ensure PyMOL is installed: conda install -c conda-forge pymol-open-source")
-    sys.exit(1)
-
-def initialize_pymol():
-    \"\"\"Initialize PyMOL for scripting.\"\"\"
-    cmd.reinitialize()
-    print("[OK] PyMOL initialized")
-
-def calculate_ca_rmsd(ref_pdb, pred_pdb, chain="{design_chain}"):
-    \"\"\"Calculate untrimmed CA RMSD between structures.\"\"\"
-
-    # Clear and load structures
-    cmd.delete("all")
-    cmd.load(ref_pdb, "reference")
-    cmd.load(pred_pdb, "predicted")
-
-    # Align on CA atoms only (cycles=0 for no trimming)
-    ref_sel = f"reference and name CA and chain {{chain}}"
-    pred_sel = f"predicted and name CA and chain {{chain}}"
+python3 {analysis_file} \\
+    --ref-dir {ref_dir} \\
+    --pred-dir {colabfold_dir} \\
+    --chain {design_chain} \\
+    --parts-dir {parts_dir} \\
+    --chunk-size {RMSD_CHUNK_SIZE}
+"""
 
-    alignment_result = cmd.align(pred_sel, ref_sel, cycles=0)
-    rmsd = alignment_result[0]
+    write_script(script_file, script_content)
 
-    return rmsd
+    print(f"[OK] Generated PyMOL comparison script")
+    return script_file
 
-# Find reference PDB
-ref_dir = "{ref_dir}"
-ref_pdbs = list(Path(ref_dir).glob("*_unrelaxed_rank_001*.pdb"))
+def create_pymol_merge_script(job_dir, job_name):
+    """Generate the job that merges partial RMSD CSVs into the sorted results file."""
+    pymol_dir = os.path.join(job_dir, "pymol_analysis")
+    parts_dir = os.path.join(pymol_dir, "parts")
+    logs_dir = os.path.join(job_dir, "logs")
 
-if not ref_pdbs:
-    print(f"[ERROR] ERROR: No reference PDB found in {{ref_dir}}")
-    sys.exit(1)
+    # Output CSV path
+    output_csv = os.path.join(pymol_dir, f"{job_name}_rmsd_results.csv")
 
-ref_pdb = str(ref_pdbs[0])
-print(f"[ANALYZING] Reference: {{os.path.basename(ref_pdb)}}")
+    script_file = os.path.join(pymol_dir, "pymol_merge.sh")
 
-# Find all predicted structures
-colabfold_dir = "{colabfold_dir}"
-pred_pdbs = sorted(Path(colabfold_dir).glob("*_unrelaxed_rank_001*.pdb"))
+    script_content = f"""#!/bin/bash
+#SBATCH --job-name=pymerge_{job_name}
+#SBATCH --output={logs_dir}/pymol_merge_%j.out
+#SBATCH --error={logs_dir}/pymol_merge_%j.err
+#SBATCH --partition={SLURM_PARTITION_CPU}
+#SBATCH --cpus-per-task=1
+#SBATCH --mem=4G
+#SBATCH --time=0:30:00
 
-if not pred_pdbs:
-    print(f"[ERROR] ERROR: No predicted structures found in {{colabfold_dir}}")
-    sys.exit(1)
+module load conda/latest
+eval "$(conda shell.bash hook)"
+conda activate {BASE_CONDA_ENV}
 
-print(f"[STATS] Found {{len(pred_pdbs)}} predicted structures to analyze")
+cd {job_dir}
 
-# Initialize PyMOL
-initialize_pymol()
+python3 <<'PYTHON_SCRIPT'
+import os
+import sys
+import csv
 
-# Perform batch comparison
+parts_dir = "{parts_dir}"
 results = []
 
-for i, pred_pdb in enumerate(pred_pdbs, 1):
-    pred_pdb_str = str(pred_pdb)
-    basename = os.path.basename(pred_pdb_str)
-
-    if i % 10 == 0:
-        print(f"  Processing {{i}}/{{len(pred_pdbs)}}...")
+for name in sorted(os.listdir(parts_dir)):
+    if name.endswith(".csv"):
+        with open(os.path.join(parts_dir, name), newline='') as f:
+            results.extend(csv.reader(f))
 
-    try:
-        rmsd = calculate_ca_rmsd(ref_pdb, pred_pdb_str)
-
-        # Parse temperature and ID from filename
-        # Format: jobname_T0.1_id_10_unrelaxed...
-        parts = basename.split("_")
-        temp = None
-        seq_id = None
-
-        for j, part in enumerate(parts):
-            if part.startswith("T") and j+1 < len(parts):
-                temp = part[1:]  # Remove 'T' prefix
-            if part == "id" and j+1 < len(parts):
-                seq_id = parts[j+1]
-
-        results.append({{
-            "structure": basename,
-            "temperature": temp,
-            "sequence_id": seq_id,
-            "chain": "{design_chain}",
-            "rmsd_angstroms": round(rmsd, 3),
-            "path": pred_pdb_str
-        }})
-
-    except Exception as e:
-        print(f"[WARNING]  Error processing {{basename}}: {{e}}")
-        continue
+if not results:
+    print(f"[ERROR] ERROR: No RMSD results found in {{parts_dir}}")
+    sys.exit(1)
 
-# Sort by RMSD
-results.sort(key=lambda x: x["rmsd_angstroms"])
+# Sort by RMSD (path breaks ties, since array tasks finish out of order)
+results.sort(key=lambda r: (float(r[4]), r[5]))
 
 # Save to CSV
 output_csv = "{output_csv}"
-with open(output_csv, 'w', newline='') as csvfile:
-    fieldnames = ["structure", "temperature", "sequence_id", "chain", "rmsd_angstroms", "path"]
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-    writer.writeheader()
+with open(output_csv, 'w', newline='', buffering=1 << 20) as csvfile:
+    writer = csv.writer(csvfile)
+    writer.writerow(["structure", "temperature", "sequence_id", "chain", "rmsd_angstroms", "path"])
     writer.writerows(results)
 
 print(f"\\n[OK] RMSD analysis complete!")
@@ -881,86 +1096,96 @@ print(f"[OK] Results saved to: {{output_csv}}")
 print(f"\\n[RESULTS] Top 10 designs by RMSD:")
 print(f"{{'='*60}}")
 
-for i, result in enumerate(results[:10], 1):
-    temp = result['temperature'] if result['temperature'] else 'N/A'
-    seq_id = result['sequence_id'] if result['sequence_id'] else 'N/A'
-    print(f"  {{i:2d}}. T={{temp:<4s}} ID={{seq_id:<4s}} RMSD={{result['rmsd_angstroms']:.3f}} Å")
+for i, (structure, temp, seq_id, chain, rmsd, path) in enumerate(results[:10], 1):
+    temp = temp if temp else 'N/A'
+    seq_id = seq_id if seq_id else 'N/A'
+    print(f"  {{i:2d}}. T={{temp:<4s}} ID={{seq_id:<4s}} RMSD={{float(rmsd):.3f}} Å")
 
 print(f"{{'='*60}}")
 print(f"[METRICS] Total structures analyzed: {{len(results)}}")
 
-if results:
-    best = results[0]
-    worst = results[-1]
-    avg = sum(r['rmsd_angstroms'] for r in results) / len(results)
-    print(f"[STATS] Best RMSD:    {{best['rmsd_angstroms']:.3f}} Å ({{best['structure']}})")
-    print(f"[STATS] Worst RMSD:   {{worst['rmsd_angstroms']:.3f}} Å")
-    print(f"[STATS] Average RMSD: {{avg:.3f}} Å")
+best = results[0]
+worst = results[-1]
+avg = sum(float(r[4]) for r in results) / len(results)
+print(f"[STATS] Best RMSD:    {{float(best[4]):.3f}} Å ({{best[0]}})")
+print(f"[STATS] Worst RMSD:   {{float(worst[4]):.3f}} Å")
+print(f"[STATS] Average RMSD: {{avg:.3f}} Å")
 
 PYTHON_SCRIPT
 """
 
-    with open(script_file, 'w') as f:
-        f.write(script_content)
+    write_script(script_file, script_content)
 
-    print(f"[OK] Generated PyMOL comparison script")
+    print(f"[OK] Generated RMSD merge script")
     return script_file
 
 # ================================
 # JOB SUBMISSION
 # ================================
 
-def submit_job(script_path, dependency=None):
-    """Submit a single SLURM job and return job ID."""
-    cmd = ["sbatch"]
+def _submit(extra_args, script_path, dependency=None):
+    """Run sbatch directly and return the job ID, or None on failure."""
+    cmd = [_SBATCH, "--parsable", *extra_args]
 
     if dependency:
         cmd += ["--dependency", f"afterok:{dependency}"]
 
     cmd.append(script_path)
 
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    except OSError as e:
+        print(f"[ERROR] Failed to submit {script_path}")
+        print(f"Error: {e}")
+        return None
 
     if result.returncode != 0:
         print(f"[ERROR] Failed to submit {script_path}")
         print(f"Error: {result.stderr}")
         return None
 
-    output = result.stdout.strip()
-    job_id = int(output.split()[-1])
-    print(f"[OK] Submitted job {job_id}: {os.path.basename(script_path)}")
+    # --parsable prints "jobid[;cluster]"
+    try:
+        return int(result.stdout.split(";")[0])
+    except ValueError:
+        print(f"[ERROR] Failed to submit {script_path}")
+        print(f"Error: unexpected sbatch output: {result.stdout.strip()!r}")
+        return None
+
+def submit_job(script_path, dependency=None):
+    """Submit a single SLURM job and return job ID."""
+    job_id = _submit([], script_path, dependency)
+    if job_id is not None:
+        print(f"[OK] Submitted job {job_id}: {os.path.basename(script_path)}")
 
     return job_id
 
 def submit_array_job(script_path, num_tasks, dependency=None):
     """Submit a SLURM array job and return job ID."""
-    cmd = ["sbatch", f"--array=1-{num_tasks}"]
-
-    if dependency:
-        cmd += ["--dependency", f"afterok:{dependency}"]
-
-    cmd.append(script_path)
-
-    result = subprocess.run(cmd, capture_output=True, text=True)
-
-    if result.returncode != 0:
-        print(f"[ERROR] Failed to submit {script_path}")
-        print(f"Error: {result.stderr}")
-        return None
-
-    output = result.stdout.strip()
-    job_id = int(output.split()[-1])
-    print(f"[OK] Submitted array job {job_id} ({num_tasks} tasks): {os.path.basename(script_path)}")
+    job_id = _submit([f"--array=1-{num_tasks}"], script_path, dependency)
+    if job_id is not None:
+        print(f"[OK] Submitted array job {job_id} ({num_tasks} tasks): {os.path.basename(script_path)}")
 
     return job_id
 
+def cancel_and_exit(job_ids, message):
+    """Cancel already-queued jobs after a failed submission, then exit."""
+    print(f"[ERROR] {message}")
+    if job_ids:
+        print(f"[WARNING]  Cancelling {len(job_ids)} already-submitted job(s): {' '.join(map(str, job_ids))}")
+        subprocess.run([_SCANCEL, *map(str, job_ids)])
+    sys.exit(1)
+
 def count_fasta_tasks(cf_tasks_file):
     """Count number of tasks in cf_tasks.txt."""
-    if not os.path.isfile(cf_tasks_file):
+    try:
+        with open(cf_tasks_file, 'rb') as f:
+            data = f.read()
+    except (FileNotFoundError, IsADirectoryError):
         return 0
 
-    with open(cf_tasks_file, 'r') as f:
-        return len(f.readlines())
+    # Count newlines in the raw bytes rather than building a list of lines
+    return data.count(b"\n") + (data[-1:] not in (b"", b"\n"))
 
 # ================================
 # MAIN PIPELINE
@@ -1055,17 +1280,22 @@ All outputs will be organized in: jobs/JOBNAME/
     # Reference structure script
     reference_script = create_reference_colabfold_script(job_dir, job_name, input_fasta)
 
-    # LigandMPNN scripts
-    ligandmpnn_scripts = create_ligandmpnn_scripts(job_dir, job_name, args.chain, args.temperatures,
-                                                     args.batch_size, args.num_batches, fixed_residues,
-                                                     args.conservation_threshold)
+    # LigandMPNN array script (one task per temperature)
+    ligandmpnn_script = create_ligandmpnn_array_script(job_dir, job_name, args.chain, args.temperatures,
+                                                       args.batch_size, args.num_batches, fixed_residues,
+                                                       args.conservation_threshold)
     postprocess_script = create_ligandmpnn_postprocess_script(job_dir, job_name, args.chain, args.temperatures)
 
-    # ColabFold monomer script (will need task count after post-processing)
+    # ColabFold monomer script (array size is set by the launcher after post-processing)
     colabfold_script = create_colabfold_monomer_script(job_dir, job_name)
 
     # PyMOL comparison script
     pymol_script = create_pymol_comparison_script(job_dir, job_name, args.chain)
+    pymol_merge_script = create_pymol_merge_script(job_dir, job_name)
+
+    # Launcher that submits ColabFold (and PyMOL) once the task count is known
+    colabfold_launcher = create_colabfold_launcher_script(job_dir, job_name, colabfold_script, pymol_script,
+                                                          pymol_merge_script)
 
     print("[OK] All scripts generated!")
 
@@ -1081,6 +1311,8 @@ All outputs will be organized in: jobs/JOBNAME/
     print("\n[STARTING] STAGE 2: Submitting jobs with dependencies...")
 
     job_ids = {}
+    # Every queued job ID, so a failed submission can cancel the partial chain
+    submitted = []
 
     # Submit HHblits chain
     print("\n--- HHblits Chain ---")
@@ -1088,8 +1320,8 @@ All outputs will be organized in: jobs/JOBNAME/
     for script in hhblits_scripts:
         job_id = submit_job(script, dependency=prev_job_id)
         if not job_id:
-            print("[ERROR] Failed to submit HHblits chain")
-            sys.exit(1)
+            cancel_and_exit(submitted, "Failed to submit HHblits chain")
+        submitted.append(job_id)
         prev_job_id = job_id
     job_ids['hhblits_final'] = prev_job_id
 
@@ -1097,92 +1329,52 @@ All outputs will be organized in: jobs/JOBNAME/
     print("\n--- HHfilter ---")
     job_id = submit_job(hhfilter_script, dependency=job_ids['hhblits_final'])
     if not job_id:
-        print("[ERROR] Failed to submit HHfilter")
-        sys.exit(1)
+        cancel_and_exit(submitted, "Failed to submit HHfilter")
+    submitted.append(job_id)
     job_ids['hhfilter'] = job_id
 
     # Submit conservation analysis (depends on HHfilter)
     print("\n--- Conservation Analysis ---")
     job_id = submit_job(conservation_script, dependency=job_ids['hhfilter'])
     if not job_id:
-        print("[ERROR] Failed to submit conservation analysis")
-        sys.exit(1)
+        cancel_and_exit(submitted, "Failed to submit conservation analysis")
+    submitted.append(job_id)
     job_ids['conservation'] = job_id
 
     # Submit reference ColabFold (in parallel, no dependency)
     print("\n--- Reference Structure (ColabFold) ---")
     job_id = submit_job(reference_script)
     if not job_id:
-        print("[ERROR] Failed to submit reference ColabFold")
-        sys.exit(1)
+        cancel_and_exit(submitted, "Failed to submit reference ColabFold")
+    submitted.append(job_id)
     job_ids['reference'] = job_id
 
-    # Submit LigandMPNN jobs (depend on both conservation AND reference)
+    # Submit LigandMPNN array (depends on both conservation AND reference)
     print("\n--- LigandMPNN Designs ---")
     dependency_str = f"{job_ids['conservation']}:{job_ids['reference']}"
-    ligandmpnn_job_ids = []
-    for script in ligandmpnn_scripts:
-        cmd = ["sbatch", "--dependency", f"afterok:{dependency_str}", script]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            print(f"[ERROR] Failed to submit {script}")
-            continue
-        job_id = int(result.stdout.strip().split()[-1])
-        ligandmpnn_job_ids.append(job_id)
-        print(f"[OK] Submitted job {job_id}: {os.path.basename(script)}")
-
-    if not ligandmpnn_job_ids:
-        print("[ERROR] Failed to submit LigandMPNN jobs")
-        sys.exit(1)
-    job_ids['ligandmpnn'] = ligandmpnn_job_ids
+    job_id = submit_array_job(ligandmpnn_script, len(args.temperatures), dependency=dependency_str)
+    if not job_id:
+        cancel_and_exit(submitted, "Failed to submit LigandMPNN array")
+    submitted.append(job_id)
+    job_ids['ligandmpnn'] = job_id
 
-    # Submit post-processing (depends on all LigandMPNN jobs)
+    # Submit post-processing (afterok on the array waits for every task)
     print("\n--- Post-Processing ---")
-    lmpnn_dependency = ":".join(str(jid) for jid in ligandmpnn_job_ids)
-    cmd = ["sbatch", "--dependency", f"afterok:{lmpnn_dependency}", postprocess_script]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"[ERROR] Failed to submit post-processing")
-        sys.exit(1)
-    job_id = int(result.stdout.strip().split()[-1])
+    job_id = submit_job(postprocess_script, dependency=job_ids['ligandmpnn'])
+    if not job_id:
+        cancel_and_exit(submitted, "Failed to submit post-processing")
+    submitted.append(job_id)
     job_ids['postprocess'] = job_id
-    print(f"[OK] Submitted job {job_id}: {os.path.basename(postprocess_script)}")
-
-    # Submit ColabFold monomer (depends on post-processing)
-    # We need to estimate the number of tasks (will be finalized after post-processing)
-    print("\n--- ColabFold Monomer Predictions ---")
-    # Estimate: temperatures * batches * batch_size - 1 (skip first seq)
-    estimated_tasks = len(args.temperatures) * args.num_batches * args.batch_size
-    estimated_tasks = estimated_tasks - len(args.temperatures)  # Subtract first seqs
-
-    print(f"[STATS] Estimated ~{estimated_tasks} sequences to predict")
-    print(f"[WARNING]  Note: Actual number determined after post-processing completes")
-    print(f"[TIP] To submit ColabFold after post-processing finishes:")
-    print(f"   NUM_TASKS=$(wc -l < {job_dir}/ligandmpnn/cf_tasks.txt)")
-    print(f"   sbatch --array=1-$NUM_TASKS --dependency=afterok:{job_ids['postprocess']} {colabfold_script}")
-
-    # For now, we'll use the estimated number
-    cmd = ["sbatch", f"--array=1-{estimated_tasks}", "--dependency", f"afterok:{job_ids['postprocess']}", colabfold_script]
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode != 0:
-        print(f"[WARNING]  ColabFold submission may have failed (task count estimation)")
-        print(f"Error: {result.stderr}")
-    else:
-        job_id = int(result.stdout.strip().split()[-1])
-        job_ids['colabfold'] = job_id
-        print(f"[OK] Submitted array job {job_id}: {os.path.basename(colabfold_script)}")
-
-    # Submit PyMOL comparison (depends on ColabFold)
-    print("\n--- PyMOL RMSD Comparison ---")
-    if 'colabfold' in job_ids:
-        job_id = submit_job(pymol_script, dependency=job_ids['colabfold'])
-        if job_id:
-            job_ids['pymol'] = job_id
-            print(f"[OK] Submitted PyMOL comparison job {job_id}")
-        else:
-            print("[WARNING]  PyMOL comparison submission failed (non-critical)")
-    else:
-        print("[WARNING]  Skipping PyMOL comparison (ColabFold not submitted)")
+
+    # Submit the ColabFold launcher (depends on post-processing). It counts
+    # cf_tasks.txt, submits the ColabFold array with exactly that many tasks,
+    # and chains the RMSD comparison array and merge onto it.
+    print("\n--- ColabFold Monomer Predictions + RMSD Comparison ---")
+    job_id = submit_job(colabfold_launcher, dependency=job_ids['postprocess'])
+    if not job_id:
+        cancel_and_exit(submitted, "Failed to submit ColabFold launcher")
+    submitted.append(job_id)
+    job_ids['colabfold_launcher'] = job_id
 
     # ================================
     # STAGE 3: SUMMARY
@@ -1197,12 +1389,9 @@ All outputs will be organized in: jobs/JOBNAME/
     print(f"   HHfilter:             Job {job_ids['hhfilter']}")
     print(f"   Conservation:         Job {job_ids['conservation']}")
     print(f"   Reference structure:  Job {job_ids['reference']}")
-    print(f"   LigandMPNN designs:   Jobs {ligandmpnn_job_ids}")
+    print(f"   LigandMPNN designs:   Job {job_ids['ligandmpnn']} (array, {len(args.temperatures)} tasks)")
     print(f"   Post-processing:      Job {job_ids['postprocess']}")
-    if 'colabfold' in job_ids:
-        print(f"   ColabFold monomer:    Job {job_ids['colabfold']}")
-    if 'pymol' in job_ids:
-        print(f"   PyMOL comparison:     Job {job_ids['pymol']}")
+    print(f"   ColabFold launcher:   Job {job_ids['colabfold_launcher']} (submits ColabFold + RMSD arrays)")
 
     print(f"\n[STATS] Monitor jobs with: squeue -u $USER")
     print(f"View logs in: {job_dir}/logs/")
@@ -7,12 +7,10 @@ import sys
 import argparse
 import subprocess
 from pathlib import Path
-from Bio import SeqIO
 import pyrosetta
 from pyrosetta import pose_from_pdb
 from pyrosetta.rosetta.core.pose import Pose
-from pyrosetta.rosetta.core.chemical import oneletter_to_name3
-from pyrosetta.rosetta.protocols.simple_moves import MutateResidue
+from pyrosetta.rosetta.protocols.simple_moves import SimpleThreadingMover
 
 
 def parse_args():
@@ -49,12 +47,36 @@ def parse_args():
     return parser.parse_args()
 
 
-def thread_sequence_onto_pdb(ref_pdb_path, sequence, output_pdb_path):
+def iter_fasta(fasta_file):
     """
-    Thread a sequence onto a reference PDB structure using PyRosetta
+    Yield (id, sequence) for each record in a FASTA file
     """
-    # Load reference structure
-    pose = pose_from_pdb(ref_pdb_path)
+    header = None
+    chunks = []
+
+    with open(fasta_file, 'rb') as f:
+        for line in f:
+            if line.startswith(b'>'):
+                if header is not None:
+                    yield header, b''.join(chunks).decode()
+                # ID is the first word of the header line, as in Biopython
+                words = line[1:].split()
+                header = words[0].decode() if words else ''
+                chunks = []
+            elif header is not None:
+                chunks.append(b''.join(line.split()))
+
+    if header is not None:
+        yield header, b''.join(chunks).decode()
+
+
+def thread_sequence_onto_pdb(ref_pose, sequence, output_pdb_path):
+    """
+    Thread a sequence onto a copy of the reference pose using PyRosetta
+    """
+    # Copy the reference structure (parsed once by the caller)
+    pose = Pose()
+    pose.assign(ref_pose)
 
     # Check sequence length matches
     if len(sequence) != pose.total_residue():
@@ -63,14 +85,9 @@ def thread_sequence_onto_pdb(ref_pdb_path, sequence, output_pdb_path):
             f"PDB residue count ({pose.total_residue()})"
         )
 
-    # Thread sequence onto structure
-    for i, aa in enumerate(sequence, start=1):
-        # Convert single-letter to three-letter code
-        aa3 = oneletter_to_name3(aa)
-
-        # Mutate residue
-        mutator = MutateResidue(i, aa)
-        mutator.apply(pose)
+    # Thread the whole sequence onto the structure in one mover application
+    threader = SimpleThreadingMover(sequence, 1)
+    threader.apply(pose)
 
     # Save threaded structure
     pose.dump_pdb(output_pdb_path)
@@ -84,22 +101,25 @@ def create_input_pdbs(fasta_file, ref_pdb, input_dir):
     # Initialize PyRosetta (quiet mode)
     pyrosetta.init('-mute all')
 
+    # Load reference structure once; each sequence threads onto a copy
+    ref_pose = pose_from_pdb(ref_pdb)
+
     tags = []
-    sequences = list(SeqIO.parse(fasta_file, 'fasta'))
+    sequences = list(iter_fasta(fasta_file))
 
     print(f"Processing {len(sequences)} sequences from {fasta_file}")
     print(f"Reference PDB: {ref_pdb}")
 
-    for i, record in enumerate(sequences, start=1):
+    for i, (record_id, sequence) in enumerate(sequences, start=1):
         # Create tag from sequence ID or use index
-        seq_id = record.id if record.id else f"seq_{i:04d}"
+        seq_id = record_id if record_id else f"seq_{i:04d}"
         # Clean tag (remove special characters that might cause issues)
         tag = ''.join(c if c.isalnum() or c in '_-' else '_' for c in seq_id)
 
         output_pdb = os.path.join(input_dir, f"{tag}.pdb")
 
         try:
-            thread_sequence_onto_pdb(ref_pdb, str(record.seq), output_pdb)
+            thread_sequence_onto_pdb(ref_pose, sequence, output_pdb)
             tags.append(tag)
             print(f"  [{i}/{len(sequences)}] Created {tag}.pdb")
         except Exception as e:
@@ -4,39 +4,53 @@ Convert Chai Discovery formatted FASTA to AlphaFold3 formatted JSON
 """
 
 import json
+import os
 import argparse
-from typing import Dict, List, Tuple
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Tuple
 import re
 
 
-def parse_chai_fasta(fasta_path: str) -> Tuple[List[Dict], Dict[str, str], Dict[str, str]]:
-    """Parse Chai Discovery FASTA format and extract sequences with metadata."""
-    sequences = []
+# Chain IDs in spreadsheet-column order: A..Z, then AA..ZZ
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+CHAIN_IDS = list(LETTERS) + [a + b for a in LETTERS for b in LETTERS]
+
+
+def parse_chai_fasta_iter(fasta_path: str) -> Iterator[Dict]:
+    """Lazily yield {'header', 'sequence'} records from a Chai Discovery FASTA."""
     current_header = None
-    current_sequence = []
+    current_sequence = bytearray()
 
-    with open(fasta_path, 'r') as f:
+    # Iterating the binary file splits lines in C, buffering only what a
+    # line needs; lines of any length are read in linear time
+    with open(fasta_path, 'rb') as f:
         for line in f:
             line = line.strip()
-            if line.startswith('>'):
-                # Save previous sequence if exists
+            if line.startswith(b'>'):
+                # Emit previous sequence if exists
                 if current_header and current_sequence:
-                    sequences.append({
+                    yield {
                         'header': current_header,
-                        'sequence': ''.join(current_sequence)
-                    })
-                    current_sequence = []
+                        'sequence': current_sequence.decode()
+                    }
+                    current_sequence = bytearray()
 
-                current_header = line[1:]  # Remove '>'
+                current_header = line[1:].decode()  # Remove '>'
             else:
-                current_sequence.append(line)
+                current_sequence.extend(line)
 
-        # Save last sequence
-        if current_header and current_sequence:
-            sequences.append({
-                'header': current_header,
-                'sequence': ''.join(current_sequence)
-            })
+    # Emit last sequence
+    if current_header and current_sequence:
+        yield {
+            'header': current_header,
+            'sequence': current_sequence.decode()
+        }
+
+
+def parse_chai_fasta(fasta_path: str) -> Tuple[List[Dict], Dict[str, str], Dict[str, str]]:
+    """Parse Chai Discovery FASTA format and extract sequences with metadata."""
+    sequences = list(parse_chai_fasta_iter(fasta_path))
 
     # Assign chain IDs as A, B, C, D, etc. in order
     chains = {}
@@ -44,7 +58,7 @@ def parse_chai_fasta(fasta_path: str) -> Tuple[List[Dict], Dict[str, str], Dict[
     for i, seq_data in enumerate(sequences):
         header = seq_data['header']
         sequence = seq_data['sequence']
-        chain_id = chr(ord('A') + i)  # A, B, C, D, ...
+        chain_id = CHAIN_IDS[i]  # A, B, ..., Z, AA, AB, ...
 
         chains[chain_id] = sequence
         headers[chain_id] = header
@@ -52,25 +66,23 @@ def parse_chai_fasta(fasta_path: str) -> Tuple[List[Dict], Dict[str, str], Dict[
     return sequences, chains, headers
 
 
+# SMILES typically contain only these characters (plus whitespace)
+NON_SMILES_RE = re.compile(r'[^CNOSPFlBrI\[\]()=#@+\-.0-9\\/\s]')
+# And often have these patterns
+SMILES_PATTERN_RE = re.compile(r'C\(|\)|\[|\]|=|#|@|Cl|Br|O|N|S')
+
+
 def is_smiles_string(sequence: str) -> bool:
     """Check if a string is likely a SMILES notation."""
-    # SMILES typically contain these characters
-    smiles_chars = set('CNOSPFClBrI[]()=#@+-.0123456789\\/')
-    # And often have these patterns
-    smiles_patterns = ['C(', ')', '[', ']', '=', '#', '@', 'Cl', 'Br', 'O', 'N', 'S']
-
     # Remove whitespace
     seq = sequence.strip()
 
     # Check if it contains typical SMILES characters
-    if not all(c in smiles_chars or c.isspace() for c in seq):
+    if NON_SMILES_RE.search(seq):
         return False
 
-    # Check for common SMILES patterns
-    smiles_score = 0
-    for pattern in smiles_patterns:
-        if pattern in seq:
-            smiles_score += 1
+    # Score one point per distinct SMILES pattern present
+    smiles_score = len(set(SMILES_PATTERN_RE.findall(seq)))
 
     # If it has brackets or parentheses and other SMILES features, likely SMILES
     has_brackets = '(' in seq or '[' in seq
@@ -79,28 +91,34 @@ def is_smiles_string(sequence: str) -> bool:
     return smiles_score >= 2 or (has_brackets and len(seq) < 500)
 
 
+LIGAND_HEADER_KEYWORDS = ('ligand', 'smiles', 'small molecule', 'compound')
+# Deletes nucleotides plus the ignored '-' and 'X'; anything left means not DNA/RNA
+NON_NUCLEOTIDE_TABLE = str.maketrans('', '', 'ATCGU-X')
+
+
 def determine_entity_type(sequence: str, header: str = "") -> str:
     """Determine if sequence is protein, DNA, RNA, or ligand/SMILES."""
-    sequence = sequence.strip().upper()
+    seq = sequence.strip()  # returns seq itself when there is nothing to strip
+    # Sequences are normally uppercase already; isupper() scans without copying
+    if not seq.isupper():
+        seq = seq.upper()
+    return _determine_entity_type_cached(seq, header.lower())
 
+
+@functools.lru_cache(maxsize=4096)
+def _determine_entity_type_cached(sequence: str, header_lower: str) -> str:
+    """Classify a normalized (stripped, uppercased) sequence; cached per chain."""
     # Check header for hints
-    header_lower = header.lower()
-    if any(keyword in header_lower for keyword in ['ligand', 'smiles', 'small molecule', 'compound']):
+    if any(keyword in header_lower for keyword in LIGAND_HEADER_KEYWORDS):
         return 'ligand'
 
     # Check if it's a SMILES string
     if is_smiles_string(sequence):
         return 'ligand'
 
-    # Count nucleotide characters
-    nucleotides = set('ATCGU')
-    amino_acids = set('ACDEFGHIKLMNPQRSTVWY')
-
-    seq_chars = set(sequence.replace('-', '').replace('X', ''))
-
-    # Check if mostly nucleotides
-    if seq_chars.issubset(nucleotides):
-        if 'U' in seq_chars:
+    # Check if only nucleotides remain once '-' and 'X' are ignored
+    if not sequence.translate(NON_NUCLEOTIDE_TABLE):
+        if 'U' in sequence:
             return 'rna'
         else:
             return 'dna'
@@ -113,73 +131,166 @@ def sanitize_sequence(sequence: str) -> str:
     return sequence.replace('-', '')
 
 
-def create_af3_json(chains: Dict[str, str], headers: Dict[str, str], job_name: str = "chai_to_af3_conversion") -> Dict:
-    """Create AlphaFold3 formatted JSON from parsed chains."""
-    af3_json = {
+def build_entity(chain_id: str, sequence: str, entity_type: str) -> Dict:
+    """Build one AlphaFold3 sequence entry for a classified chain."""
+    if entity_type == 'ligand':
+        # Don't sanitize SMILES - dashes are valid in SMILES notation
+        return {
+            "ligand": {
+                "id": chain_id,
+                "smiles": sequence.strip()
+            }
+        }
+
+    # protein, dna and rna entries share the same shape
+    return {
+        entity_type: {
+            "id": chain_id,
+            "sequence": sanitize_sequence(sequence)
+        }
+    }
+
+
+def create_af3_json(entities: List[Dict], job_name: str = "chai_to_af3_conversion") -> Dict:
+    """Create AlphaFold3 formatted JSON from built sequence entries."""
+    return {
         "name": job_name,
-        "sequences": [],
+        "sequences": entities,
         "dialect": "alphafold3",
-        "version": 1
+        "version": 1,
+        # Add modelSeeds for reproducibility
+        "modelSeeds": [42]  # Default seed
     }
 
-    # Process each chain
-    for chain_id, sequence in sorted(chains.items()):
-        header = headers.get(chain_id, "")
-        entity_type = determine_entity_type(sequence, header)
-
-        if entity_type == 'protein':
-            entity = {
-                "protein": {
-                    "id": chain_id,
-                    "sequence": sanitize_sequence(sequence)
-                }
-            }
-        elif entity_type == 'dna':
-            entity = {
-                "dna": {
-                    "id": chain_id,
-                    "sequence": sanitize_sequence(sequence)
-                }
-            }
-        elif entity_type == 'rna':
-            entity = {
-                "rna": {
-                    "id": chain_id,
-                    "sequence": sanitize_sequence(sequence)
-                }
-            }
-        elif entity_type == 'ligand':
-            # Don't sanitize SMILES - dashes are valid in SMILES notation
-            entity = {
-                "ligand": {
-                    "id": chain_id,
-                    "smiles": sequence.strip()
-                }
-            }
 
-        af3_json["sequences"].append(entity)
+def write_af3_json(af3_json: Dict, f, pretty: bool = False) -> None:
+    """Write AF3 JSON to f one sequence entry at a time.
 
-    # Add modelSeeds for reproducibility
-    af3_json["modelSeeds"] = [42]  # Default seed
+    Output is byte-identical to json.dumps (compact, or indent=2 when pretty),
+    but only one chain is ever encoded in memory, which matters for jobs with
+    megabase-long sequences. AlphaFold3 does not need indentation, so compact
+    is the default.
+    """
+    if pretty:
+        nl, pad, key_sep = '\n', '  ', ': '
 
-    return af3_json
+        def encode(obj, level):
+            # Nested lines pick up the enclosing indentation
+            return json.dumps(obj, indent=2).replace('\n', '\n' + pad * level)
+    else:
+        nl, pad, key_sep = '', '', ':'
+
+        def encode(obj, level):
+            return json.dumps(obj, separators=(',', ':'))
+
+    f.write('{')
+    for i, (key, value) in enumerate(af3_json.items()):
+        f.write((',' if i else '') + nl + pad + json.dumps(key) + key_sep)
+        if key == 'sequences' and value:
+            f.write('[')
+            for j, entity in enumerate(value):
+                f.write((',' if j else '') + nl + pad * 2 + encode(entity, 2))
+            f.write(nl + pad + ']')
+        else:
+            f.write(encode(value, 1))
+    f.write(nl + '}')
+
+
+FASTA_SUFFIXES = ('.fasta', '.fa', '.faa')
+
+
+def convert_one(input_fasta: str, output_json: str, job_name: str,
+                seeds: List[int], pretty: bool = False) -> List[str]:
+    """Convert one Chai FASTA to AlphaFold3 JSON; return per-chain summary lines."""
+    # Parse, classify and build each chain in a single pass over the FASTA
+    entities = []
+    chain_lines = []
+    for i, record in enumerate(parse_chai_fasta_iter(input_fasta)):
+        chain_id = CHAIN_IDS[i]  # A, B, ..., Z, AA, AB, ...
+        seq = record['sequence']
+        entity_type = determine_entity_type(seq, record['header'])
+        entities.append(build_entity(chain_id, seq, entity_type))
+
+        if entity_type == 'ligand':
+            chain_lines.append(f"  Chain {chain_id}: {entity_type} (SMILES: {seq.strip()})")
+        else:
+            chain_lines.append(f"  Chain {chain_id}: {entity_type} ({len(seq)} residues)")
+
+    # Create AlphaFold3 JSON
+    af3_json = create_af3_json(entities, job_name)
+    af3_json["modelSeeds"] = seeds
+
+    # Write output JSON
+    with open(output_json, 'w') as f:
+        write_af3_json(af3_json, f, pretty)
+
+    return chain_lines
+
+
+def convert_batch(input_dir: str, output_dir: str, seeds: List[int],
+                  pretty: bool = False, workers: int = None) -> List[str]:
+    """Convert every FASTA in input_dir in one process pool; return written paths."""
+    with os.scandir(input_dir) as entries:
+        fastas = sorted(e.path for e in entries
+                        if e.is_file() and e.name.lower().endswith(FASTA_SUFFIXES))
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    futures = {}
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for fasta in fastas:
+            # Job name is the input filename, as in single-file mode
+            base_name = os.path.splitext(os.path.basename(fasta))[0]
+            output_json = os.path.join(output_dir, base_name + '.json')
+            future = pool.submit(convert_one, fasta, output_json, base_name, seeds, pretty)
+            futures[future] = (fasta, output_json)
+
+    written = []
+    for future, (fasta, output_json) in futures.items():
+        try:
+            chain_lines = future.result()
+        except Exception as e:
+            print(f"  ERROR converting {fasta}: {e}")
+            continue
+        print(f"  {os.path.basename(fasta)} -> {output_json} ({len(chain_lines)} chain(s))")
+        written.append(output_json)
+
+    return sorted(written)
 
 
 def main():
     parser = argparse.ArgumentParser(
         description='Convert Chai Discovery FASTA to AlphaFold3 JSON format'
     )
-    parser.add_argument('input_fasta', help='Input FASTA file in Chai Discovery format')
+    parser.add_argument('input_fasta', nargs='?', help='Input FASTA file in Chai Discovery format')
     parser.add_argument('output_json', nargs='?', help='Output JSON file (default: input filename with .json extension)')
     parser.add_argument('--output-dir', '-o', help='Output directory for JSON file (overrides output_json path)')
+    parser.add_argument('--input-dir', '-i',
+                       help='Convert every FASTA (.fasta/.fa/.faa) in this directory in one run')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Worker processes for --input-dir (default: all CPUs)')
     parser.add_argument('--name', default='chai_to_af3_conversion',
                        help='Job name for the AlphaFold3 run')
     parser.add_argument('--seeds', nargs='+', type=int, default=[42],
                        help='Model seeds for AlphaFold3 (default: 42)')
+    parser.add_argument('--pretty', action='store_true',
+                       help='Indent the output JSON for reading (default: compact)')
 
     args = parser.parse_args()
 
-    import os
+    # Batch mode: one Python startup for the whole directory
+    if args.input_dir:
+        if args.input_fasta:
+            parser.error('give either input_fasta or --input-dir, not both')
+        output_dir = args.output_dir or args.input_dir
+        print(f"Converting Chai Discovery FASTAs in: {args.input_dir}")
+        written = convert_batch(args.input_dir, output_dir, args.seeds,
+                                args.pretty, args.workers)
+        print(f"\nWrote {len(written)} AlphaFold3 JSON file(s) to: {output_dir}")
+        return
+
+    if not args.input_fasta:
+        parser.error('input_fasta is required unless --input-dir is given')
 
     # Get base name from input file
     base_name = os.path.splitext(os.path.basename(args.input_fasta))[0]
@@ -197,26 +308,13 @@ def main():
         os.makedirs(args.output_dir, exist_ok=True)
         args.output_json = os.path.join(args.output_dir, os.path.basename(args.output_json))
 
-    # Parse the FASTA file
     print(f"Reading Chai Discovery FASTA from: {args.input_fasta}")
-    sequences, chains, headers = parse_chai_fasta(args.input_fasta)
+    chain_lines = convert_one(args.input_fasta, args.output_json, args.name,
+                              args.seeds, args.pretty)
 
-    print(f"Found {len(chains)} chain(s):")
-    for chain_id, seq in chains.items():
-        header = headers.get(chain_id, "")
-        entity_type = determine_entity_type(seq, header)
-        if entity_type == 'ligand':
-            print(f"  Chain {chain_id}: {entity_type} (SMILES: {seq.strip()})")
-        else:
-            print(f"  Chain {chain_id}: {entity_type} ({len(seq)} residues)")
-
-    # Create AlphaFold3 JSON
-    af3_json = create_af3_json(chains, headers, args.name)
-    af3_json["modelSeeds"] = args.seeds
-
-    # Write output JSON
-    with open(args.output_json, 'w') as f:
-        json.dump(af3_json, f, indent=2)
+    print(f"Found {len(chain_lines)} chain(s):")
+    for line in chain_lines:
+        print(line)
 
     print(f"\nAlphaFold3 JSON written to: {args.output_json}")
     print("\nExample AlphaFold3 command:")
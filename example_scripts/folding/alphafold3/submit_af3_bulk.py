@@ -28,8 +28,9 @@ def main():
         print(f"Error: {input_dir} is not a directory")
         sys.exit(1)
 
-    # Find all JSON files
-    json_files = list(input_dir.glob("*.json"))
+    # Find all JSON files (scandir entries carry their file type, so no extra stat per file)
+    with os.scandir(input_dir) as entries:
+        json_files = sorted(e.name for e in entries if e.name.endswith(".json") and e.is_file())
 
     if not json_files:
         print(f"No JSON files found in {input_dir}")
@@ -54,8 +55,7 @@ def main():
     # Create file list for array job
     json_list_file = logs_dir / "json_files_list.txt"
     with open(json_list_file, 'w') as f:
-        for json_file in sorted(json_files):
-            f.write(f"{json_file.name}\n")
+        f.write("".join(f"{name}\n" for name in json_files))
 
     print(f"Created file list: {json_list_file}")
     print(f"Array job will process indices 1-{len(json_files)}")
@@ -191,17 +191,20 @@ echo "AlphaFold 3 prediction for $JSON_FILE finished successfully!"
         result = subprocess.run(
             ["sbatch", str(slurm_script_path)],
             cwd=input_dir,
-            capture_output=True,
-            text=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
             check=True
         )
 
+        # Only the first line ("Submitted batch job NNNN") is needed
+        sbatch_output = result.stdout.split(b'\n', 1)[0].decode()
+
         print(f"Job submitted successfully!")
-        print(f"SLURM output: {result.stdout.strip()}")
+        print(f"SLURM output: {sbatch_output}")
 
         # Extract job ID from output if possible
-        if "Submitted batch job" in result.stdout:
-            job_id = result.stdout.split()[-1]
+        if "Submitted batch job" in sbatch_output:
+            job_id = sbatch_output.split()[-1]
             print()
             print("Useful commands:")
             print(f"  Check job status: squeue -j {job_id}")
@@ -211,8 +214,8 @@ echo "AlphaFold 3 prediction for $JSON_FILE finished successfully!"
 
     except subprocess.CalledProcessError as e:
         print(f"Error submitting job: {e}")
-        print(f"STDOUT: {e.stdout}")
-        print(f"STDERR: {e.stderr}")
+        print(f"STDOUT: {e.stdout.decode(errors='replace')}")
+        print(f"STDERR: {e.stderr.decode(errors='replace')}")
         sys.exit(1)
     except FileNotFoundError:
         print("Error: sbatch command not found. Make sure SLURM is available.")
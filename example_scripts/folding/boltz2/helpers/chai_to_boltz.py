@@ -13,94 +13,86 @@ import os
 from pathlib import Path
 
 
-def parse_chai_fasta(fasta_file):
-    """Parse CHAI fasta file and extract sequences."""
-    sequences = []
+# Chain IDs in spreadsheet-column order: A..Z, then AA..ZZ
+LETTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+CHAIN_IDS = list(LETTERS) + [a + b for a in LETTERS for b in LETTERS]
 
-    with open(fasta_file, 'r') as f:
-        current_header = None
-        current_seq = []
 
+def parse_chai_fasta_iter(fasta_file):
+    """Lazily yield {'header', 'sequence'} entries from a CHAI fasta file."""
+    current_header = None
+    current_seq = bytearray()
+
+    # Read line by line from the binary file; long lines stay linear
+    with open(fasta_file, 'rb') as f:
         for line in f:
             line = line.strip()
             if not line:
                 continue
 
-            if line.startswith('>'):
-                # Save previous entry if exists
+            if line.startswith(b'>'):
+                # Emit previous entry if exists
                 if current_header is not None:
-                    sequences.append({
+                    yield {
                         'header': current_header,
-                        'sequence': ''.join(current_seq)
-                    })
+                        'sequence': current_seq.decode()
+                    }
 
                 # Parse new header
-                current_header = line[1:]  # Remove '>'
-                current_seq = []
+                current_header = line[1:].decode()  # Remove '>'
+                current_seq = bytearray()
             else:
-                current_seq.append(line)
+                current_seq.extend(line)
+
+    # Emit last entry
+    if current_header is not None:
+        yield {
+            'header': current_header,
+            'sequence': current_seq.decode()
+        }
 
-        # Save last entry
-        if current_header is not None:
-            sequences.append({
-                'header': current_header,
-                'sequence': ''.join(current_seq)
-            })
 
-    return sequences
+def parse_chai_fasta(fasta_file):
+    """Parse CHAI fasta file and extract sequences."""
+    return list(parse_chai_fasta_iter(fasta_file))
 
 
-def convert_to_boltz_yaml(sequences):
-    """Convert parsed CHAI sequences to Boltz2 YAML format."""
-    yaml_lines = ['version: 1', 'sequences:']
+def convert_to_boltz_yaml(sequences, out):
+    """Convert parsed CHAI sequences to Boltz2 YAML format, writing to out."""
+    out.write('version: 1\nsequences:\n')
 
     # Track chain IDs
-    chain_id_counter = ord('A')
+    chain_index = 0
 
     for seq_entry in sequences:
         header = seq_entry['header']
         sequence = seq_entry['sequence']
 
         # Parse header: format is "type|name"
-        parts = header.split('|', 1)
-        if len(parts) != 2:
+        entity_type, sep, entity_name = header.partition('|')
+        if not sep:
             print(f"Warning: Skipping malformed header: {header}", file=sys.stderr)
             continue
 
-        entity_type = parts[0].lower()
-        entity_name = parts[1] if len(parts) > 1 else "unknown"
+        entity_type = entity_type.lower()
 
         # Assign chain ID
-        chain_id = chr(chain_id_counter)
-        chain_id_counter += 1
+        chain_id = CHAIN_IDS[chain_index]
+        chain_index += 1
 
         if entity_type == 'protein':
-            yaml_lines.append(f'  - protein:')
-            yaml_lines.append(f'      id: {chain_id}')
-            yaml_lines.append(f'      sequence: {sequence}')
-            yaml_lines.append(f'      # {entity_name}')
+            out.write(f"  - protein:\n      id: {chain_id}\n      sequence: {sequence}\n      # {entity_name}\n")
 
         elif entity_type == 'ligand':
-            yaml_lines.append(f'  - ligand:')
-            yaml_lines.append(f'      id: {chain_id}')
-            yaml_lines.append(f"      smiles: '{sequence}'")
-            yaml_lines.append(f'      # {entity_name}')
+            out.write(f"  - ligand:\n      id: {chain_id}\n      smiles: '{sequence}'\n      # {entity_name}\n")
 
         elif entity_type in ['dna', 'rna']:
-            yaml_lines.append(f'  - {entity_type}:')
-            yaml_lines.append(f'      id: {chain_id}')
-            yaml_lines.append(f'      sequence: {sequence}')
-            yaml_lines.append(f'      # {entity_name}')
+            out.write(f"  - {entity_type}:\n      id: {chain_id}\n      sequence: {sequence}\n      # {entity_name}\n")
 
         else:
             print(f"Warning: Unknown entity type '{entity_type}' for {entity_name}", file=sys.stderr)
             print(f"         Treating as ligand with SMILES", file=sys.stderr)
-            yaml_lines.append(f'  - ligand:')
-            yaml_lines.append(f'      id: {chain_id}')
-            yaml_lines.append(f"      smiles: '{sequence}'")
-            yaml_lines.append(f'      # {entity_name}')
-
-    return '\n'.join(yaml_lines)
+            out.write(f"  - ligand:\n      id: {chain_id}\n      smiles: '{sequence}'\n      # {entity_name}\n")
 
 
 def main():
@@ -134,17 +126,14 @@ def main():
 
     print(f"Found {len(sequences)} sequences:", file=sys.stderr)
     for seq in sequences:
-        header_parts = seq['header'].split('|', 1)
-        entity_type = header_parts[0]
-        entity_name = header_parts[1] if len(header_parts) > 1 else "unknown"
+        entity_type, sep, entity_name = seq['header'].partition('|')
+        if not sep:
+            entity_name = "unknown"
         print(f"  - {entity_type}: {entity_name}", file=sys.stderr)
 
-    yaml_content = convert_to_boltz_yaml(sequences)
-
-    # Write output
+    # Convert, writing each entry straight to the output file
     with open(output_file, 'w') as f:
-        f.write(yaml_content)
-        f.write('\n')
+        convert_to_boltz_yaml(sequences, f)
 
     print(f"\nConversion complete! Output written to: {output_file}", file=sys.stderr)
     print(f"\nTo run with Boltz2:", file=sys.stderr)
@@ -2,68 +2,103 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import io
 import os
 import re
-import subprocess
-import tempfile
-import socket
 from pathlib import Path
 
+# Various forms of conda initialization
+CONDA_SETUP_PATTERNS = [
+    r'.*conda\.sh.*',  # source ~/miniconda3/etc/profile.d/conda.sh
+    r'.*conda/bin/activate.*',  # source /path/to/conda/bin/activate
+    r'.*miniconda.*init.*',  # conda init patterns
+    r'.*anaconda.*init.*',  # anaconda init patterns
+    r'__conda_setup=.*',  # conda init variable
+    r'.*>>> conda initialize >>>.*',  # conda init markers
+    r'.*<<< conda initialize <<<.*',
+    r'eval "\$\(.*conda.*init.*\)"',  # eval conda init
+    r'export PATH=.*conda.*/bin:',  # PATH modifications for conda
+    r'export PATH=.*anaconda.*/bin:',  # PATH modifications for anaconda
+    r'.*mamba.*init.*',  # mamba init patterns
+    r'.*micromamba.*init.*',  # micromamba init patterns
+    r'source.*activate.*base',  # Activating base environment
+]
+# One alternation, so each line is matched once instead of once per pattern
+_CONDA_SETUP_RE = re.compile('|'.join(f'(?:{p})' for p in CONDA_SETUP_PATTERNS), re.IGNORECASE)
+# Every pattern above contains one of these words
+_CONDA_SETUP_TOKENS = ('conda', 'mamba', 'activate')
+
+# Line patterns used by process_bash_profile, compiled once at import
+_MODULE_LOAD_CONDA_SUB_RE = re.compile(r'module\s+load\s+conda\S*')
+# Classifies a line by its leading command with one match, dispatching on
+# the group. "module load conda" is tried before the plain "module load".
+# Any alias name is captured; the '=' right after it keeps "sandbox" from
+# matching "sandboxlow=" when the name is looked up.
+_LINE_KIND_RE = re.compile(
+    r'\s*(?:(?P<module_conda>module\s+load\s+conda)'
+    r'|(?P<module>module\s+load)'
+    r'|(?P<conda_activate>conda\s+activate)'
+    r'|alias\s+(?P<alias>[\w-]+)=)'
+)
+
 def detect_conda_setup(line):
     """Detect various forms of conda initialization"""
-    conda_patterns = [
-        r'.*conda\.sh.*',  # source ~/miniconda3/etc/profile.d/conda.sh
-        r'.*conda/bin/activate.*',  # source /path/to/conda/bin/activate
-        r'.*miniconda.*init.*',  # conda init patterns
-        r'.*anaconda.*init.*',  # anaconda init patterns
-        r'__conda_setup=.*',  # conda init variable
-        r'.*>>> conda initialize >>>.*',  # conda init markers
-        r'.*<<< conda initialize <<<.*',
-        r'eval "\$\(.*conda.*init.*\)"',  # eval conda init
-        r'export PATH=.*conda.*/bin:',  # PATH modifications for conda
-        r'export PATH=.*anaconda.*/bin:',  # PATH modifications for anaconda
-        r'.*mamba.*init.*',  # mamba init patterns
-        r'.*micromamba.*init.*',  # micromamba init patterns
-        r'source.*activate.*base',  # Activating base environment
-    ]
-    return any(re.match(pattern, line, re.IGNORECASE) for pattern in conda_patterns)
-
-def replace_username_with_user_var(line, username):
-    """Replace hardcoded username with $USER, but not in filepaths"""
-    # Skip if username not in line
-    if username not in line:
-        return line
+    # Most lines mention none of the tokens; skip the regex for those
+    lowered = line.lower()
+    if not any(token in lowered for token in _CONDA_SETUP_TOKENS):
+        return False
+    return _CONDA_SETUP_RE.match(line) is not None
+
+def _build_username_patterns(username):
+    """Compile the username path and replacement patterns for one username"""
+    # Escape the username so characters like '.' are matched literally
+    user = re.escape(username)
     
     # Patterns where we should NOT replace (paths)
     path_patterns = [
-        r'/home/{}'.format(username),
-        r'/users/{}'.format(username),
-        r'/share/.*/{}'.format(username),
-        r'/quobyte/.*/{}'.format(username),
-        r'~{}/'.format(username),
-        r'{}@'.format(username),  # SSH format
-        r'/{}/'.format(username),  # Any path component
+        r'/home/{}'.format(user),
+        r'/users/{}'.format(user),
+        r'/share/.*/{}'.format(user),
+        r'/quobyte/.*/{}'.format(user),
+        r'~{}/'.format(user),
+        r'{}@'.format(user),  # SSH format
+        r'/{}/'.format(user),  # Any path component
     ]
     
-    # Check if username appears in a path context
-    for pattern in path_patterns:
-        if re.search(pattern, line):
-            return line
-    
     # Common patterns where we SHOULD replace
     # Look for username in command arguments, environment variables, etc.
     replacement_patterns = [
-        (r'(\s-u\s+){}(\s|$|")'.format(username), r'\1$USER\2'),  # -u username
-        (r'(\s--user\s+){}(\s|$|")'.format(username), r'\1$USER\2'),  # --user username
-        (r'(\s--user=){}(\s|$|")'.format(username), r'\1$USER\2'),  # --user=username
-        (r'(USER=){}(\s|$|")'.format(username), r'\1$USER\2'),  # USER=username
-        (r'(\$USER:-){}' .format(username), r'\1$USER'),  # ${USER:-username}
-        (r'(\w+=["\']*){}'.format(username) + r'(["\']*)', r'\1$USER\2'),  # VAR=username or VAR="username"
+        (r'(\s-u\s+){}(\s|$|")'.format(user), r'\1$USER\2'),  # -u username
+        (r'(\s--user\s+){}(\s|$|")'.format(user), r'\1$USER\2'),  # --user username
+        (r'(\s--user=){}(\s|$|")'.format(user), r'\1$USER\2'),  # --user=username
+        (r'(USER=){}(\s|$|")'.format(user), r'\1$USER\2'),  # USER=username
+        (r'(\$USER:-){}' .format(user), r'\1$USER'),  # ${USER:-username}
+        (r'(\w+=["\']*){}'.format(user) + r'(["\']*)', r'\1$USER\2'),  # VAR=username or VAR="username"
     ]
     
+    return {
+        'path': re.compile('|'.join(path_patterns)),
+        'replacements': [(re.compile(p), r) for p, r in replacement_patterns],
+    }
+
+def replace_username_with_user_var(line, username, user_patterns=None):
+    """Replace hardcoded username with $USER, but not in filepaths"""
+    # Skip if username not in line
+    if username not in line:
+        return line
+    
+    # Callers handling many lines pass patterns built once for the username
+    if user_patterns is None:
+        user_patterns = _build_username_patterns(username)
+    
+    # Check if username appears in a path context, with one search. Every
+    # path pattern contains '/' or '@', so other lines can skip it.
+    if ('/' in line or '@' in line) and user_patterns['path'].search(line):
+        return line
+    
     modified_line = line
-    for pattern, replacement in replacement_patterns:
-        modified_line = re.sub(pattern, replacement, modified_line)
+    for pattern, replacement in user_patterns['replacements']:
+        modified_line = pattern.sub(replacement, modified_line)
     
     return modified_line
 
@@ -78,10 +113,11 @@ def process_bash_profile(source_path: Path, username: str, quobyte_dir: str, ver
         'sandboxlowgpu': "alias sandboxlowgpu='srun -p low --gres=gpu:a6000:1 --cpus-per-task=8 --mem=16G --time=1-00:00:00 --pty bash'"
     }
     
-    with open(source_path, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-
-    new_lines = []
+    # Username patterns, likewise compiled once for the whole profile
+    user_patterns = _build_username_patterns(username)
+    
+    # Output is written into one growing buffer rather than a list of lines
+    buf = io.StringIO()
     module_comment_made = False
     conda_found = False
     existing_aliases = set()
@@ -90,101 +126,111 @@ def process_bash_profile(source_path: Path, username: str, quobyte_dir: str, ver
     existing_conda_module = False
     conda_env_vars_added = False
 
-    for i, line in enumerate(lines):
-        # Check for conda initialization block
-        if '>>> conda initialize >>>' in line:
-            in_conda_block = True
-            if verbose:
-                print(f"Found conda init block start at line {i+1}")
-            conda_found = True
-            continue  # Skip this line entirely
-        elif '<<< conda initialize <<<' in line:
-            in_conda_block = False
-            if verbose:
-                print(f"Found conda init block end at line {i+1}")
-            continue  # Skip this line entirely
+    # Iterate the file directly rather than reading it into a list first
+    with open(source_path, 'r', encoding='utf-8') as f:
+        for i, line in enumerate(f):
+            # Check for conda initialization block
+            if '>>> conda initialize >>>' in line:
+                in_conda_block = True
+                if verbose:
+                    print(f"Found conda init block start at line {i+1}")
+                conda_found = True
+                continue  # Skip this line entirely
+            elif '<<< conda initialize <<<' in line:
+                in_conda_block = False
+                if verbose:
+                    print(f"Found conda init block end at line {i+1}")
+                continue  # Skip this line entirely
             
-        # Skip lines within conda block
-        if in_conda_block:
-            continue  # Remove conda init lines entirely
-
-        # Check for existing module load conda
-        if re.match(r'^\s*module\s+load\s+conda', line):
-            existing_conda_module = True
-            if 'conda/latest' not in line:
+            # Skip lines within conda block
+            if in_conda_block:
+                continue  # Remove conda init lines entirely
+
+            # Classify the line once; the rewrites below never change how
+            # it starts, so the result holds for the whole iteration
+            kind_match = _LINE_KIND_RE.match(line)
+            kind = kind_match.lastgroup if kind_match else None
+
+            # Check for existing module load conda
+            if kind == 'module_conda':
+                existing_conda_module = True
+                if 'conda/latest' not in line:
+                    if verbose:
+                        print(f"Updating module load conda to conda/latest at line {i+1}")
+                    line = _MODULE_LOAD_CONDA_SUB_RE.sub('module load conda/latest', line)
+
+            # Detect existing sandbox aliases
+            if kind == 'alias' and kind_match.group('alias') in sandbox_aliases:
+                existing_aliases.add(kind_match.group('alias'))
+
+            # Replace hardcoded path
+            if '/share/siegellab/' in line:
                 if verbose:
-                    print(f"Updating module load conda to conda/latest at line {i+1}")
-                line = re.sub(r'module\s+load\s+conda\S*', 'module load conda/latest', line)
-
-        # Detect existing sandbox aliases
-        for alias_name in sandbox_aliases:
-            if re.match(rf'^\s*alias\s+{alias_name}=', line):
-                existing_aliases.add(alias_name)
-
-        # Replace hardcoded path
-        if '/share/siegellab/' in line:
-            if verbose:
-                print(f"Replacing path at line {i+1}: /share/siegellab/ -> /quobyte/jbsiegelgrp/")
-            line = line.replace('/share/siegellab/', '/quobyte/jbsiegelgrp/')
+                    print(f"Replacing path at line {i+1}: /share/siegellab/ -> /quobyte/jbsiegelgrp/")
+                line = line.replace('/share/siegellab/', '/quobyte/jbsiegelgrp/')
         
-        # Replace hardcoded username with $USER (but not in paths)
-        old_line = line
-        line = replace_username_with_user_var(line, username)
-        if old_line != line and verbose:
-            print(f"Replaced username with $USER at line {i+1}")
-
-        # Handle conda sourcing outside of conda blocks
-        if detect_conda_setup(line) and not in_conda_block:
-            if verbose:
-                print(f"Removing conda setup line at line {i+1}: {line.strip()}")
-            conda_found = True
-            continue  # Skip conda setup lines entirely
+            # Replace hardcoded username with $USER (but not in paths)
+            old_line = line
+            line = replace_username_with_user_var(line, username, user_patterns)
+            if old_line != line and verbose:
+                print(f"Replaced username with $USER at line {i+1}")
+
+            # Handle conda sourcing outside of conda blocks
+            if detect_conda_setup(line) and not in_conda_block:
+                if verbose:
+                    print(f"Removing conda setup line at line {i+1}: {line.strip()}")
+                conda_found = True
+                continue  # Skip conda setup lines entirely
 
-        # Handle conda activate commands
-        if re.match(r'^\s*conda\s+activate', line):
-            if verbose:
-                print(f"Removing conda activate at line {i+1}")
-            continue  # Skip conda activate lines
-
-        # Comment out module loads and insert guidance
-        if re.match(r'^\s*module\s+load', line) and 'conda' not in line and 'cuda' not in line:
-            module_name = line.strip().split('module load')[-1].strip()
-            new_lines.append(f"# {line}")
-            new_lines.append(f'echo "NOTE: Module \'{module_name}\' was loaded on the old cluster. '
-                             f'Use \'module avail {module_name}\' on hive.hpc.ucdavis.edu to find it."\n')
-            module_comment_made = True
-        else:
-            new_lines.append(line)
+            # Handle conda activate commands
+            if kind == 'conda_activate':
+                if verbose:
+                    print(f"Removing conda activate at line {i+1}")
+                continue  # Skip conda activate lines
+
+            # Comment out module loads and insert guidance
+            if kind == 'module' and 'conda' not in line and 'cuda' not in line:
+                module_name = line.strip().split('module load')[-1].strip()
+                buf.write(f"# {line}")
+                buf.write(f'echo "NOTE: Module \'{module_name}\' was loaded on the old cluster. '
+                                 f'Use \'module avail {module_name}\' on hive.hpc.ucdavis.edu to find it."\n')
+                module_comment_made = True
+            else:
+                buf.write(line)
 
     # Add conda modules if conda was found but modules not added
+    header = ''
     if (conda_found or existing_conda_module) and not existing_conda_module:
         if verbose:
             print("Adding conda and cuda modules")
-        new_lines.insert(0, "# Loading conda and cuda modules\n")
-        new_lines.insert(1, "module load conda/latest\n")
-        new_lines.insert(2, "module load cuda/12.6.2\n")
-        new_lines.insert(3, "\n")
+        header = ("# Loading conda and cuda modules\n"
+                  "module load conda/latest\n"
+                  "module load cuda/12.6.2\n"
+                  "\n")
     
     # Add conda environment variables
     if verbose:
         print(f"Adding conda environment variables for quobyte directory: {quobyte_dir}")
-    new_lines.append("\n# Conda configuration for HIVE (limited home storage)\n")
-    new_lines.append(f"export CONDA_PKGS_DIRS=/quobyte/jbsiegelgrp/{quobyte_dir}/.conda/pkgs\n")
-    new_lines.append(f"export CONDA_ENVS_PATH=/quobyte/jbsiegelgrp/{quobyte_dir}/.conda/envs\n")
-    new_lines.append("# Additional cache directories for Python packages\n")
-    new_lines.append(f"export PIP_CACHE_DIR=/quobyte/jbsiegelgrp/{quobyte_dir}/.cache/pip\n")
-    new_lines.append(f"export HF_HOME=/quobyte/jbsiegelgrp/{quobyte_dir}/.cache/huggingface\n")
-    new_lines.append(f"export TORCH_HOME=/quobyte/jbsiegelgrp/{quobyte_dir}/.cache/torch\n")
-    new_lines.append(f"export TRANSFORMERS_CACHE=/quobyte/jbsiegelgrp/{quobyte_dir}/.cache/transformers\n")
+    # Every conda and cache directory lives under the user's quobyte directory
+    base = f"/quobyte/jbsiegelgrp/{quobyte_dir}"
+    buf.write("\n# Conda configuration for HIVE (limited home storage)\n")
+    buf.write(f"export CONDA_PKGS_DIRS={base}/.conda/pkgs\n")
+    buf.write(f"export CONDA_ENVS_PATH={base}/.conda/envs\n")
+    buf.write("# Additional cache directories for Python packages\n")
+    buf.write(f"export PIP_CACHE_DIR={base}/.cache/pip\n")
+    buf.write(f"export HF_HOME={base}/.cache/huggingface\n")
+    buf.write(f"export TORCH_HOME={base}/.cache/torch\n")
+    buf.write(f"export TRANSFORMERS_CACHE={base}/.cache/transformers\n")
 
     # Add missing sandbox aliases
     missing_aliases = set(sandbox_aliases.keys()) - existing_aliases
     if missing_aliases:
-        new_lines.append("\n# Interactive session aliases\n")
+        buf.write("\n# Interactive session aliases\n")
         for alias_name in sorted(missing_aliases):
-            new_lines.append(sandbox_aliases[alias_name] + "\n")
+            buf.write(sandbox_aliases[alias_name] + "\n")
 
-    return ''.join(new_lines), module_comment_made, conda_found
+    # The header goes in front of the body, so it is joined on at the end
+    return header + buf.getvalue(), module_comment_made, conda_found
 
 def create_simple_bash_profile():
     """Create a simple .bash_profile that sources .bashrc"""
@@ -211,12 +257,15 @@ pkgs_dirs:
 env_prompt: '({{name}}) '
 """
 
-def scp_to_remote(temp_file: Path, remote_user: str, remote_host: str, remote_path: str):
-    """Upload file to remote host"""
-    subprocess.run(['scp', str(temp_file), f'{remote_user}@{remote_host}:{remote_path}'], check=True)
+def scp_to_remote(temp_file: Path, remote_user: str, remote_host: str, remote_path: str, control_path: str = None):
+    """Upload file to remote host, over an existing master connection if given"""
+    import subprocess
+    options = ['-o', f'ControlPath={control_path}'] if control_path else []
+    subprocess.run(['scp', *options, str(temp_file), f'{remote_user}@{remote_host}:{remote_path}'], check=True)
 
 def check_cluster(verbose=False):
     """Check which cluster we're running on and prevent running on HIVE."""
+    import socket
     try:
         hostname = socket.gethostname().lower()
         
@@ -285,11 +334,22 @@ def main():
         print("-" * 50)
         return
 
+    # Only the upload needs these; a dry run never imports them
+    import subprocess
+    import tempfile
+
     # Create temporary files for all config files
     bashrc_tmp = None
     bash_profile_tmp = None
     condarc_tmp = None
     
+    # All ssh and scp calls share one master connection, so the handshake
+    # (and any password prompt) happens once rather than for every call
+    remote = f'{args.ssh_username}@hive.hpc.ucdavis.edu'
+    user_base = f'/quobyte/jbsiegelgrp/{args.quobyte_dir}'
+    control_path = f'/tmp/ssh-hive-{os.getpid()}'
+    master_started = False
+    
     try:
         # Create temporary .bashrc
         with tempfile.NamedTemporaryFile(mode='w+', delete=False, prefix='bashrc_hive_', dir='/tmp', encoding='utf-8') as tmp:
@@ -306,9 +366,14 @@ def main():
             tmp.write(create_condarc(args.quobyte_dir))
             condarc_tmp = Path(tmp.name)
 
+        # Open the shared connection in the background
+        print("Connecting to hive.hpc.ucdavis.edu...")
+        subprocess.run(['ssh', '-M', '-S', control_path, '-fNT', remote], check=True)
+        master_started = True
+
         # Create backup on remote
         print("Creating backup of existing files on remote...")
-        subprocess.run(['ssh', f'{args.ssh_username}@hive.hpc.ucdavis.edu', 
+        subprocess.run(['ssh', '-S', control_path, remote, 
                        'cp ~/.bashrc ~/.bashrc.backup.$(date +%Y%m%d_%H%M%S) 2>/dev/null || true; '
                        'cp ~/.bash_profile ~/.bash_profile.backup.$(date +%Y%m%d_%H%M%S) 2>/dev/null || true; '
                        'cp ~/.condarc ~/.condarc.backup.$(date +%Y%m%d_%H%M%S) 2>/dev/null || true'])
@@ -316,24 +381,24 @@ def main():
         # Create necessary directories on remote
         print("Creating conda and cache directories on remote...")
         conda_dirs_cmd = (
-            f'mkdir -p /quobyte/jbsiegelgrp/{args.quobyte_dir}/.conda/pkgs '
-            f'/quobyte/jbsiegelgrp/{args.quobyte_dir}/.conda/envs '
-            f'/quobyte/jbsiegelgrp/{args.quobyte_dir}/.cache/pip '
-            f'/quobyte/jbsiegelgrp/{args.quobyte_dir}/.cache/huggingface '
-            f'/quobyte/jbsiegelgrp/{args.quobyte_dir}/.cache/torch '
-            f'/quobyte/jbsiegelgrp/{args.quobyte_dir}/.cache/transformers'
+            f'mkdir -p {user_base}/.conda/pkgs '
+            f'{user_base}/.conda/envs '
+            f'{user_base}/.cache/pip '
+            f'{user_base}/.cache/huggingface '
+            f'{user_base}/.cache/torch '
+            f'{user_base}/.cache/transformers'
         )
-        subprocess.run(['ssh', f'{args.ssh_username}@hive.hpc.ucdavis.edu', conda_dirs_cmd], check=True)
+        subprocess.run(['ssh', '-S', control_path, remote, conda_dirs_cmd], check=True)
 
         # Upload all files
         print("Uploading modified .bashrc...")
-        scp_to_remote(bashrc_tmp, args.ssh_username, 'hive.hpc.ucdavis.edu', '~/.bashrc')
+        scp_to_remote(bashrc_tmp, args.ssh_username, 'hive.hpc.ucdavis.edu', '~/.bashrc', control_path)
         
         print("Uploading new .bash_profile...")
-        scp_to_remote(bash_profile_tmp, args.ssh_username, 'hive.hpc.ucdavis.edu', '~/.bash_profile')
+        scp_to_remote(bash_profile_tmp, args.ssh_username, 'hive.hpc.ucdavis.edu', '~/.bash_profile', control_path)
         
         print("Uploading .condarc...")
-        scp_to_remote(condarc_tmp, args.ssh_username, 'hive.hpc.ucdavis.edu', '~/.condarc')
+        scp_to_remote(condarc_tmp, args.ssh_username, 'hive.hpc.ucdavis.edu', '~/.condarc', control_path)
         
         print("Upload successful.")
         
@@ -342,6 +407,11 @@ def main():
         print("Please check your SSH access or network connection.")
         return
     finally:
+        # Close the shared connection
+        if master_started:
+            subprocess.run(['ssh', '-S', control_path, '-O', 'exit', remote],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
         # Clean up temporary files
         if bashrc_tmp and bashrc_tmp.exists():
             bashrc_tmp.unlink()
@@ -362,9 +432,9 @@ def main():
         print("  Use 'module avail <module_name>' on hive to find replacements")
     
     print("[✓] Added conda configuration for limited home storage:")
-    print(f"  - Conda packages: /quobyte/jbsiegelgrp/{args.quobyte_dir}/.conda/pkgs")
-    print(f"  - Conda environments: /quobyte/jbsiegelgrp/{args.quobyte_dir}/.conda/envs")
-    print(f"  - Pip cache: /quobyte/jbsiegelgrp/{args.quobyte_dir}/.cache/pip")
+    print(f"  - Conda packages: {user_base}/.conda/pkgs")
+    print(f"  - Conda environments: {user_base}/.conda/envs")
+    print(f"  - Pip cache: {user_base}/.cache/pip")
     print("  - Created .condarc to prevent pip conflicts")
     
     print("\n[✓] Added interactive session aliases:")
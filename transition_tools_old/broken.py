@@ -6,10 +6,41 @@ Usage: python broken.py <script_filename>
 
 import sys
 import os
-import urllib.parse
+import gzip
+import base64
+from urllib.parse import quote_plus
 from pathlib import Path
 
 
+# Longer URLs are refused by many browsers; past this the script body is
+# sent gzip-compressed and base64-encoded instead of as plain text
+MAX_URL_LENGTH = 8000
+
+
+def _build_issue_url(issue_title, script_section, abs_path):
+    """Build the GitHub new-issue URL for a title and script section."""
+    
+    # Create the issue body
+    issue_body = f"""{script_section}
+
+## What happened? What should have happened?
+<!-- Describe what went wrong and what you expected to happen -->
+
+---
+**Script path:** `{abs_path}`
+**Submitted using:** `broken.py`
+"""
+    
+    # Encode each parameter directly; the fixed ones need no encoding
+    encoded_params = (f"title={quote_plus(issue_title)}"
+                      f"&body={quote_plus(issue_body)}"
+                      "&labels=bug&assignees=ianandersonlol")
+    
+    # GitHub new issue URL
+    base_url = "https://github.com/ianandersonlol/HiveTransition/issues/new"
+    return f"{base_url}?{encoded_params}"
+
+
 def create_issue_url(script_path):
     """Create a GitHub issue URL with pre-filled content."""
     
@@ -17,6 +48,9 @@ def create_issue_url(script_path):
     try:
         with open(script_path, 'r') as f:
             script_content = f.read()
+    except FileNotFoundError:
+        print(f"Error: File '{script_path}' not found.")
+        return None
     except Exception as e:
         print(f"Error reading file '{script_path}': {e}")
         return None
@@ -24,38 +58,25 @@ def create_issue_url(script_path):
     # Get absolute path for clarity
     abs_path = os.path.abspath(script_path)
     
-    # Create the issue body
-    issue_body = f"""## Script
-```bash
-{script_content}
-```
-
-## What happened? What should have happened?
-<!-- Describe what went wrong and what you expected to happen -->
-
----
-**Script path:** `{abs_path}`
-**Submitted using:** `broken.py`
-"""
-
     # Create the issue title
     script_name = Path(script_path).name
     issue_title = f"[BUG] Script issue: {script_name}"
     
-    # GitHub issue parameters
-    params = {
-        'title': issue_title,
-        'body': issue_body,
-        'labels': 'bug',
-        'assignees': 'ianandersonlol'
-    }
-    
-    # Encode parameters for URL
-    encoded_params = urllib.parse.urlencode(params)
+    script_section = f"""## Script
+```bash
+{script_content}
+```"""
+    full_url = _build_issue_url(issue_title, script_section, abs_path)
     
-    # GitHub new issue URL
-    base_url = "https://github.com/ianandersonlol/HiveTransition/issues/new"
-    full_url = f"{base_url}?{encoded_params}"
+    if len(full_url) > MAX_URL_LENGTH:
+        # Too long for most browsers: send the script compressed instead
+        encoded = base64.b64encode(gzip.compress(script_content.encode())).decode()
+        script_section = f"""## Script (gzip + base64, too long to include as text)
+Decode with: `echo '<text below>' | base64 -d | gunzip`
+```
+{encoded}
+```"""
+        full_url = _build_issue_url(issue_title, script_section, abs_path)
     
     return full_url
 
@@ -75,10 +96,6 @@ def main():
     
     script_filename = sys.argv[1]
     
-    if not os.path.exists(script_filename):
-        print(f"Error: File '{script_filename}' not found.")
-        sys.exit(1)
-    
     # Generate the URL
     url = create_issue_url(script_filename)
     
@@ -5,120 +5,117 @@ Usage: python colab_fix.py <script_filename>
 """
 
 import sys
-import os
 import re
 from pathlib import Path
 
+OLD_COLABFOLD_PATH = "/toolbox/LocalColabFold/localcolabfold/colabfold-conda/bin:$PATH"
+NEW_COLABFOLD_PATH = "/quobyte/jbsiegelgrp/software/LocalColabFold/localcolabfold/colabfold-conda/bin:$PATH"
+OLD_BASE = '/share/siegellab/'
+NEW_BASE = '/quobyte/jbsiegelgrp/'
 
-def fix_path_exports(content):
-    """Fix PATH export statements for ColabFold."""
+# Literal path rewrites, matched together so the content is scanned only once
+_PATH_SUBS = {
+    OLD_COLABFOLD_PATH: NEW_COLABFOLD_PATH,
+    OLD_BASE: NEW_BASE,
+}
+_PATH_SUBS_RE = re.compile('|'.join(re.escape(k) for k in sorted(_PATH_SUBS, key=len, reverse=True)))
+
+
+def fix_paths(content):
+    """Fix ColabFold PATH exports and hardcoded /share/siegellab/ paths in one pass."""
     changes = []
-    
-    # Pattern to match the old ColabFold path in export statements
-    old_path = "/toolbox/LocalColabFold/localcolabfold/colabfold-conda/bin:$PATH"
-    new_path = "/quobyte/jbsiegelgrp/software/LocalColabFold/localcolabfold/colabfold-conda/bin:$PATH"
-    
-    if old_path in content:
-        content = content.replace(old_path, new_path)
-        changes.append(f"Updated ColabFold PATH: {old_path} -> {new_path}")
-    
+    counts = dict.fromkeys(_PATH_SUBS, 0)
+
+    def _replace(match):
+        old = match.group(0)
+        counts[old] += 1
+        return _PATH_SUBS[old]
+
+    content = _PATH_SUBS_RE.sub(_replace, content)
+
+    if counts[OLD_COLABFOLD_PATH]:
+        changes.append(f"Updated ColabFold PATH: {OLD_COLABFOLD_PATH} -> {NEW_COLABFOLD_PATH}")
+    if counts[OLD_BASE]:
+        changes.append(f"Updated {counts[OLD_BASE]} occurrence(s) of {OLD_BASE} to {NEW_BASE}")
+
     return content, changes
 
 
 def fix_slurm_flags(content):
     """Fix SLURM sbatch flags."""
     changes = []
+    # Nothing to fix without #SBATCH lines; skip splitting the whole file
+    if '#SBATCH' not in content:
+        return content, changes
+    
     lines = content.split('\n')
     modified_lines = []
     
+    # Track what the rewritten content contains as we go, so the account
+    # line decision needs no second pass over the output
+    has_a100 = 'gpu-a100' in content
+    has_account = '--account=genome-center-grp' in content or '-A genome-center-grp' in content
+    first_sbatch_idx = None
+    
     for line in lines:
-        original_line = line
-        
-        # Check if this is an sbatch line
-        if line.strip().startswith('#SBATCH'):
+        # Check if this is an sbatch line; the substring test is cheap and
+        # skips the lstrip() copy for the many lines that are not
+        if '#SBATCH' in line and line.lstrip().startswith('#SBATCH'):
+            if first_sbatch_idx is None:
+                first_sbatch_idx = len(modified_lines)
+            
             # Fix partition
             if '--partition=jbsiegel-gpu' in line or '-p jbsiegel-gpu' in line:
-                line = re.sub(r'--partition=jbsiegel-gpu', '--partition=gpu-a100', line)
-                line = re.sub(r'-p jbsiegel-gpu', '-p gpu-a100', line)
+                line = line.replace('--partition=jbsiegel-gpu', '--partition=gpu-a100')
+                line = line.replace('-p jbsiegel-gpu', '-p gpu-a100')
                 changes.append(f"Updated partition: jbsiegel-gpu -> gpu-a100")
+                has_a100 = True
             
             # Add account if not present and this is a partition line for gpu-a100
             if ('--partition=gpu-a100' in line or '-p gpu-a100' in line) and '--account=' not in line and '-A ' not in line:
                 # Add account flag to the line
                 line = line + ' --account=genome-center-grp'
                 changes.append("Added SLURM account: genome-center-grp")
-        
-        # Check for standalone account additions needed
-        elif line.strip().startswith('#SBATCH') and '--account=' not in content and '-A ' not in content:
-            # This is a bit more complex - we need to check if we have gpu partition anywhere
-            if 'gpu-a100' in content and '#SBATCH --account=genome-center-grp' not in content:
-                # We'll handle this by adding the account line after we find the first #SBATCH line
-                pass
+                has_account = True
         
         modified_lines.append(line)
     
-    # Check if we need to add account line for gpu-a100 partitions
-    content_check = '\n'.join(modified_lines)
-    if 'gpu-a100' in content_check and '--account=genome-center-grp' not in content_check and '-A genome-center-grp' not in content_check:
-        # Find the first #SBATCH line and add account after it
-        final_lines = []
-        account_added = False
-        for line in modified_lines:
-            final_lines.append(line)
-            if line.strip().startswith('#SBATCH') and not account_added:
-                final_lines.append('#SBATCH --account=genome-center-grp')
-                changes.append("Added SLURM account line: --account=genome-center-grp")
-                account_added = True
-        modified_lines = final_lines
+    # Add account line after the first #SBATCH line for gpu-a100 partitions
+    if has_a100 and not has_account and first_sbatch_idx is not None:
+        modified_lines.insert(first_sbatch_idx + 1, '#SBATCH --account=genome-center-grp')
+        changes.append("Added SLURM account line: --account=genome-center-grp")
     
     return '\n'.join(modified_lines), changes
 
 
-def fix_hardcoded_paths(content):
-    """Replace hardcoded paths from /share/siegellab/ to /quobyte/jbsiegelgrp/."""
-    changes = []
-    
-    # Only replace the base path, keeping everything after it
-    old_base = '/share/siegellab/'
-    new_base = '/quobyte/jbsiegelgrp/'
-    
-    # Count occurrences for reporting
-    count = content.count(old_base)
-    if count > 0:
-        changes.append(f"Updated {count} occurrence(s) of {old_base} to {new_base}")
-    
-    # Simple replacement - this preserves everything after the base path
-    content = content.replace(old_base, new_base)
-    
-    return content, changes
-
-
 def process_script(filename):
     """Process the script file and apply all fixes."""
-    if not os.path.exists(filename):
-        print(f"Error: File '{filename}' not found.")
-        return False
-    
     # Read the original file
     try:
-        with open(filename, 'r') as f:
-            original_content = f.read()
+        content = Path(filename).read_text()
+    except FileNotFoundError:
+        print(f"Error: File '{filename}' not found.")
+        return False
     except Exception as e:
         print(f"Error reading file '{filename}': {e}")
         return False
     
-    content = original_content
     all_changes = []
     
     # Apply all fixes
-    content, path_changes = fix_path_exports(content)
+    content, path_changes = fix_paths(content)
     all_changes.extend(path_changes)
     
     content, slurm_changes = fix_slurm_flags(content)
     all_changes.extend(slurm_changes)
     
-    content, hardcoded_changes = fix_hardcoded_paths(content)
-    all_changes.extend(hardcoded_changes)
+    # Nothing to fix: skip writing an identical _fixed copy
+    if not all_changes:
+        print(f"Processing complete!")
+        print(f"Input file: {filename}")
+        print(f"\nChanges made:")
+        print("  No changes were needed. No output file written.")
+        return True
     
     # Generate output filename
     path = Path(filename)
@@ -128,8 +125,7 @@ def process_script(filename):
     
     # Write the fixed content
     try:
-        with open(output_filename, 'w') as f:
-            f.write(content)
+        Path(output_filename).write_text(content)
     except Exception as e:
         print(f"Error writing file '{output_filename}': {e}")
         return False
@@ -140,11 +136,8 @@ def process_script(filename):
     print(f"Output file: {output_filename}")
     print(f"\nChanges made:")
     
-    if all_changes:
-        for i, change in enumerate(all_changes, 1):
-            print(f"  {i}. {change}")
-    else:
-        print("  No changes were needed.")
+    for i, change in enumerate(all_changes, 1):
+        print(f"  {i}. {change}")
     
     return True
 
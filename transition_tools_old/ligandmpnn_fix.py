@@ -5,121 +5,137 @@ Usage: python ligandmpnn_fix.py <script_filename>
 """
 
 import sys
-import os
 import re
 from pathlib import Path
 
 
+# Scripts are processed as bytes, since every pattern and replacement is ASCII.
+# Pattern to match various LigandMPNN paths from /toolbox/
+# This will catch paths like /toolbox/ligandMPNN, /toolbox/LigandMPNN, etc.
+# The hardcoded /share/siegellab/ base path shares the alternation, so the
+# content is scanned once, dispatching on the group. The base path consumes
+# its trailing slash, so a /toolbox/ path right after it is matched by the
+# optional nested group and rewritten too, as when the two ran separately.
+_LIGANDMPNN_FIXES_RE = re.compile(
+    rb'/toolbox/(?P<ligandmpnn>[Ll]igand[Mm][Pp][Nn][Nn])'
+    rb'|(?P<share>/share/siegellab/(?:toolbox/(?P<nested>[Ll]igand[Mm][Pp][Nn][Nn]))?)'
+)
+
+
 def fix_ligandmpnn_paths(content):
-    """Fix LigandMPNN installation paths."""
+    """Fix LigandMPNN installation paths and hardcoded /share/siegellab/ paths.
+
+    Returns (content, changes, hardcoded_changes); the hardcoded path
+    changes are kept apart so they can be reported last.
+    """
     changes = []
+    hardcoded_changes = []
     
-    # Pattern to match various LigandMPNN paths from /toolbox/
-    # This will catch paths like /toolbox/ligandMPNN, /toolbox/LigandMPNN, etc.
-    pattern = r'/toolbox/([Ll]igand[Mm][Pp][Nn][Nn])'
-    replacement = r'/quobyte/jbsiegelgrp/\1'
-    
-    # Find all matches for reporting
-    matches = re.findall(pattern, content)
-    if matches:
-        unique_matches = list(set(matches))
-        for match in unique_matches:
-            old_path = f"/toolbox/{match}"
-            new_path = f"/quobyte/jbsiegelgrp/{match}"
-            changes.append(f"Updated LigandMPNN path: {old_path} -> {new_path}")
+    # Only replace the base path, keeping everything after it
+    old_base = '/share/siegellab/'
+    new_base = b'/quobyte/jbsiegelgrp/'
+    
+    found = {}  # unique directory names, in order of first appearance
+    count = 0
+    
+    # Replace all occurrences, noting matches for reporting in the same scan
+    def _replace(match):
+        nonlocal count
+        prefix = b''
+        name = match.group('ligandmpnn')
+        if match.lastgroup == 'share':
+            count += 1
+            name = match.group('nested')
+            if name is None:
+                return new_base
+            # A LigandMPNN path right under the old base gets both rewrites
+            prefix = new_base.rstrip(b'/')
+        found[name] = None
+        return prefix + b'/quobyte/jbsiegelgrp/' + name
+    
+    content = _LIGANDMPNN_FIXES_RE.sub(_replace, content)
+    
+    for match in found:
+        match = match.decode()
+        old_path = f"/toolbox/{match}"
+        new_path = f"/quobyte/jbsiegelgrp/{match}"
+        changes.append(f"Updated LigandMPNN path: {old_path} -> {new_path}")
     
-    # Replace all occurrences
-    content = re.sub(pattern, replacement, content)
+    if count > 0:
+        hardcoded_changes.append(f"Updated {count} occurrence(s) of {old_base} to {new_base.decode()}")
     
-    return content, changes
+    return content, changes, hardcoded_changes
 
 
 def fix_slurm_flags(content):
     """Fix SLURM sbatch flags."""
     changes = []
-    lines = content.split('\n')
+    lines = content.split(b'\n')
     modified_lines = []
     
     for line in lines:
         original_line = line
         
-        # Check if this is an sbatch line
-        if line.strip().startswith('#SBATCH'):
+        # Check if this is an sbatch line; the substring test is cheap and
+        # skips the lstrip() copy for the many lines that are not
+        if b'#SBATCH' in line and line.lstrip().startswith(b'#SBATCH'):
             # Fix partition
-            if '--partition=jbsiegel-gpu' in line or '-p jbsiegel-gpu' in line:
-                line = re.sub(r'--partition=jbsiegel-gpu', '--partition=gpu-a100', line)
-                line = re.sub(r'-p jbsiegel-gpu', '-p gpu-a100', line)
+            if b'--partition=jbsiegel-gpu' in line or b'-p jbsiegel-gpu' in line:
+                line = line.replace(b'--partition=jbsiegel-gpu', b'--partition=gpu-a100')
+                line = line.replace(b'-p jbsiegel-gpu', b'-p gpu-a100')
                 changes.append(f"Updated partition: jbsiegel-gpu -> gpu-a100")
             
             # Add account if not present and this is a partition line for gpu-a100
-            if ('--partition=gpu-a100' in line or '-p gpu-a100' in line) and '--account=' not in line and '-A ' not in line:
+            if (b'--partition=gpu-a100' in line or b'-p gpu-a100' in line) and b'--account=' not in line and b'-A ' not in line:
                 # Add account flag to the line
-                line = line + ' --account=genome-center-grp'
+                line = line + b' --account=genome-center-grp'
                 changes.append("Added SLURM account: genome-center-grp")
         
         modified_lines.append(line)
     
     # Check if we need to add account line for gpu-a100 partitions
-    content_check = '\n'.join(modified_lines)
-    if 'gpu-a100' in content_check and '--account=genome-center-grp' not in content_check and '-A genome-center-grp' not in content_check:
+    content_check = b'\n'.join(modified_lines)
+    if b'gpu-a100' in content_check and b'--account=genome-center-grp' not in content_check and b'-A genome-center-grp' not in content_check:
         # Find the first #SBATCH line and add account after it
         final_lines = []
         account_added = False
         for line in modified_lines:
             final_lines.append(line)
-            if line.strip().startswith('#SBATCH') and not account_added:
-                final_lines.append('#SBATCH --account=genome-center-grp')
+            if not account_added and b'#SBATCH' in line and line.lstrip().startswith(b'#SBATCH'):
+                final_lines.append(b'#SBATCH --account=genome-center-grp')
                 changes.append("Added SLURM account line: --account=genome-center-grp")
                 account_added = True
         modified_lines = final_lines
     
-    return '\n'.join(modified_lines), changes
-
-
-def fix_hardcoded_paths(content):
-    """Replace hardcoded paths from /share/siegellab/ to /quobyte/jbsiegelgrp/."""
-    changes = []
-    
-    # Only replace the base path, keeping everything after it
-    old_base = '/share/siegellab/'
-    new_base = '/quobyte/jbsiegelgrp/'
-    
-    # Count occurrences for reporting
-    count = content.count(old_base)
-    if count > 0:
-        changes.append(f"Updated {count} occurrence(s) of {old_base} to {new_base}")
-    
-    # Simple replacement - this preserves everything after the base path
-    content = content.replace(old_base, new_base)
-    
-    return content, changes
+    return b'\n'.join(modified_lines), changes
 
 
 def process_script(filename):
     """Process the script file and apply all fixes."""
-    if not os.path.exists(filename):
-        print(f"Error: File '{filename}' not found.")
-        return False
-    
     # Read the original file
     try:
-        with open(filename, 'r') as f:
+        with open(filename, 'rb') as f:
             original_content = f.read()
+    except FileNotFoundError:
+        print(f"Error: File '{filename}' not found.")
+        return False
     except Exception as e:
         print(f"Error reading file '{filename}': {e}")
         return False
     
-    content = original_content
+    # Translate line endings as text-mode reading did: sbatch rejects
+    # scripts with DOS line breaks, so the output always uses '\n'
+    content = original_content.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
     all_changes = []
     
-    # Apply all fixes
-    content, ligandmpnn_changes = fix_ligandmpnn_paths(content)
+    # Apply all fixes; LigandMPNN and /share/siegellab/ paths share one
+    # scan, and the SLURM line fixes never touch paths
+    content, ligandmpnn_changes, hardcoded_changes = fix_ligandmpnn_paths(content)
     all_changes.extend(ligandmpnn_changes)
     
     content, slurm_changes = fix_slurm_flags(content)
     all_changes.extend(slurm_changes)
     
-    content, hardcoded_changes = fix_hardcoded_paths(content)
     all_changes.extend(hardcoded_changes)
     
     # Generate output filename
@@ -130,7 +146,7 @@ def process_script(filename):
     
     # Write the fixed content
     try:
-        with open(output_filename, 'w') as f:
+        with open(output_filename, 'wb') as f:
             f.write(content)
     except Exception as e:
         print(f"Error writing file '{output_filename}': {e}")
@@ -19,134 +19,180 @@ Usage:
 
 import sys
 import os
+import io
 import re
 import argparse
+import codecs
 import mimetypes
+import mmap
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout, redirect_stderr
+from functools import lru_cache
+from itertools import repeat
 from pathlib import Path
-from typing import Tuple, List
+from typing import Iterator, Tuple, List, Optional
+
+
+# Patterns applied to every file, compiled once at import
+_LIGANDMPNN_RE = re.compile(r'/toolbox/([Ll]igand[Mm][Pp][Nn][Nn])')
+# RFdiffusion installs at fixed locations, and the two whose location
+# includes a user or lab name
+RFDIFFUSION_LITERAL_PATHS = (
+    '/toolbox/RFdiffusion',
+    '/opt/RFdiffusion',
+    '/usr/local/RFdiffusion',
+    './RFdiffusion',
+    '~/RFdiffusion',
+    '$HOME/RFdiffusion',
+)
+_RFDIFFUSION_RE = re.compile('|'.join([
+    r'/home/[^/\s]+/RFdiffusion',
+    r'/share/[^/\s]+/[^/\s]+/RFdiffusion',
+    *map(re.escape, RFDIFFUSION_LITERAL_PATHS),
+]))
+NEW_SE3NV_ENV = '/quobyte/jbsiegelgrp/software/envs/SE3nv'
+# conda activate for RFdiffusion-related envs not already on the new env;
+# the env-name check happens inside the regex
+_RFDIFFUSION_CONDA_RE = re.compile(
+    rf'conda\s+activate\s+(?!{re.escape(NEW_SE3NV_ENV)}(?!\S))'
+    r'((?=\S*(?i:se3|rfdiff|rf-diff|diffusion))\S+)'
+)
+# Rosetta base paths, .default binaries and the hardcoded /share/siegellab/
+# base never overlap, so one scan rewrites all three, dispatching on the
+# matched group. A Rosetta base path under /share/siegellab/ is tried first
+# and wins, as when the base paths were rewritten before the general paths.
+_ROSETTA_RE = re.compile(
+    r'(?P<base>/[^ \t\n]+/[Rr]osetta[^ \t\n]*/main)'
+    r'|(?P<binary>\.default\.linuxgccrelease)'
+    r'|(?P<share>/share/siegellab/)'
+)
+# Old partition names in either "--partition=X" or "-p X" spelling; each
+# rewrite takes one scan of the line instead of one per spelling
+_GPU_PARTITION_RE = re.compile(r'(--partition=|-p )jbsiegel-gpu')
+_PRODUCTION_PARTITION_RE = re.compile(r'(--partition=|-p )production')
+_TIME_LONG_RE = re.compile(r'--time=([^\s]+)')
+_TIME_SHORT_RE = re.compile(r'-t\s+([^\s]+)')
+
+# Every fix below needs at least one of these substrings ("osetta" covers
+# both spellings of the Rosetta base path), so a file containing none of
+# them is left alone without being decoded or scanned any further
+_TRIGGERS = (b'/toolbox/', b'RFdiffusion', b'activate', b'osetta',
+             b'.default.linuxgccrelease', b'/share/siegellab/', b'#SBATCH')
 
 
 # ============================================================================
 # PATH MIGRATION FUNCTIONS
 # ============================================================================
 
-def fix_colabfold_paths(content: str) -> Tuple[str, List[str]]:
-    """Fix ColabFold installation paths."""
-    changes = []
+# Each fix returns the new content and appends a description of every
+# change it made to the changes list passed in, shared by all fixes for a file
 
+def fix_colabfold_paths(content: str, changes: List[str]) -> str:
+    """Fix ColabFold installation paths."""
     old_path = "/toolbox/LocalColabFold/localcolabfold/colabfold-conda/bin"
     new_path = "/quobyte/jbsiegelgrp/software/LocalColabFold/localcolabfold/colabfold-conda/bin"
 
-    if old_path in content:
-        content = content.replace(old_path, new_path)
+    # str.replace returns the same object when there is nothing to replace,
+    # so a separate "in" check would only scan the content twice
+    new_content = content.replace(old_path, new_path)
+    if new_content is not content:
         changes.append(f"ColabFold PATH: {old_path} → {new_path}")
+    content = new_content
 
-    return content, changes
+    return content
 
 
-def fix_ligandmpnn_paths(content: str) -> Tuple[str, List[str]]:
+def fix_ligandmpnn_paths(content: str, changes: List[str]) -> str:
     """Fix LigandMPNN installation paths (case-insensitive)."""
-    changes = []
+    found = {}  # unique directory names, in order of first appearance
 
-    pattern = r'/toolbox/([Ll]igand[Mm][Pp][Nn][Nn])'
-    matches = re.findall(pattern, content)
+    def _replace(match):
+        found[match.group(1)] = None
+        return f"/quobyte/jbsiegelgrp/{match.group(1)}"
 
-    if matches:
-        content = re.sub(pattern, r'/quobyte/jbsiegelgrp/\1', content)
-        for match in set(matches):
-            old_path = f"/toolbox/{match}"
-            new_path = f"/quobyte/jbsiegelgrp/{match}"
-            changes.append(f"LigandMPNN: {old_path} → {new_path}")
+    content = _LIGANDMPNN_RE.sub(_replace, content)
+    for match in found:
+        old_path = f"/toolbox/{match}"
+        new_path = f"/quobyte/jbsiegelgrp/{match}"
+        changes.append(f"LigandMPNN: {old_path} → {new_path}")
 
-    return content, changes
+    return content
 
 
-def fix_rfdiffusion_paths(content: str) -> Tuple[str, List[str]]:
+def fix_rfdiffusion_paths(content: str, changes: List[str]) -> str:
     """Fix RFdiffusion installation paths from various locations."""
-    changes = []
+    # Every location ends in this literal; without it there is nothing to scan
+    if 'RFdiffusion' not in content:
+        return content
 
     new_rfdiffusion_path = '/quobyte/jbsiegelgrp/software/RFdiffusion'
 
-    rfdiffusion_patterns = [
-        r'/home/[^/\s]+/RFdiffusion',
-        r'/share/[^/\s]+/[^/\s]+/RFdiffusion',
-        r'/toolbox/RFdiffusion',
-        r'/opt/RFdiffusion',
-        r'/usr/local/RFdiffusion',
-        r'\./RFdiffusion',
-        r'~/RFdiffusion',
-        r'\$HOME/RFdiffusion',
-    ]
-
-    for pattern in rfdiffusion_patterns:
-        matches = re.findall(pattern, content)
-        if matches:
-            for match in set(matches):
-                content = content.replace(match, new_rfdiffusion_path)
-                changes.append(f"RFdiffusion: {match} → {new_rfdiffusion_path}")
+    found = {}  # unique old paths, in order of first appearance
 
-    return content, changes
+    # All locations are matched by one alternation, so content is scanned once
+    def _replace(match):
+        found[match.group(0)] = None
+        return new_rfdiffusion_path
 
+    content = _RFDIFFUSION_RE.sub(_replace, content)
+    for match in found:
+        changes.append(f"RFdiffusion: {match} → {new_rfdiffusion_path}")
 
-def fix_rfdiffusion_conda_envs(content: str) -> Tuple[str, List[str]]:
-    """Fix RFdiffusion conda environment paths."""
-    changes = []
+    return content
 
-    new_env = '/quobyte/jbsiegelgrp/software/envs/SE3nv'
 
-    conda_pattern = r'conda\s+activate\s+([^\s\n]+)'
-    matches = re.findall(conda_pattern, content)
+def fix_rfdiffusion_conda_envs(content: str, changes: List[str]) -> str:
+    """Fix RFdiffusion conda environment paths."""
+    def _replace(match):
+        changes.append(f"RFdiffusion conda env: {match.group(1)} → {NEW_SE3NV_ENV}")
+        return f'conda activate {NEW_SE3NV_ENV}'
 
-    for match in matches:
-        if any(env_name in match.lower() for env_name in ['se3', 'rfdiff', 'rf-diff', 'diffusion']):
-            old_command = f'conda activate {match}'
-            new_command = f'conda activate {new_env}'
-            content = content.replace(old_command, new_command)
-            changes.append(f"RFdiffusion conda env: {match} → {new_env}")
+    content = _RFDIFFUSION_CONDA_RE.sub(_replace, content)
 
-    return content, changes
+    return content
 
 
-def fix_rosetta_paths(content: str) -> Tuple[str, List[str]]:
-    """Fix Rosetta installation paths and binary names."""
-    changes = []
+def fix_rosetta_paths(content: str, changes: List[str]) -> str:
+    """Fix Rosetta installation paths and binary names, and hardcoded paths.
 
-    # Fix Rosetta base paths
-    rosetta_base_pattern = r'(/[^ \t\n]+/[Rr]osetta[^ \t\n]*/main)'
+    The /share/siegellab/ → /quobyte/jbsiegelgrp/ rewrite shares the scan;
+    its change is reported last.
+    """
     new_rosetta_base = '/quobyte/jbsiegelgrp/software/Rosetta_314/rosetta/main'
-
-    matches = re.findall(rosetta_base_pattern, content)
-    for old_base in set(matches):
-        # Skip if it's already the correct path
-        if old_base != new_rosetta_base:
-            content = content.replace(old_base, new_rosetta_base)
-            changes.append(f"Rosetta base: {old_base} → {new_rosetta_base}")
-
-    # Fix Rosetta binary names: .default.linuxgccrelease → .static.linuxgccrelease
-    old_suffix = '.default.linuxgccrelease'
-    new_suffix = '.static.linuxgccrelease'
-
-    if old_suffix in content:
-        count = content.count(old_suffix)
-        content = content.replace(old_suffix, new_suffix)
-        changes.append(f"Rosetta binaries: .default → .static ({count} occurrence(s))")
-
-    return content, changes
-
-
-def fix_hardcoded_paths(content: str) -> Tuple[str, List[str]]:
-    """Replace hardcoded paths from /share/siegellab/ to /quobyte/jbsiegelgrp/."""
-    changes = []
-
     old_base = '/share/siegellab/'
     new_base = '/quobyte/jbsiegelgrp/'
+    found = {}  # unique old base paths, in order of first appearance
+    binary_count = 0
+    count = 0
+
+    def _replace(match):
+        nonlocal binary_count, count
+        kind = match.lastgroup
+        # Replace hardcoded paths from /share/siegellab/ to /quobyte/jbsiegelgrp/
+        if kind == 'share':
+            count += 1
+            return new_base
+        # Fix Rosetta binary names: .default.linuxgccrelease → .static.linuxgccrelease
+        if kind == 'binary':
+            binary_count += 1
+            return '.static.linuxgccrelease'
+        # Fix Rosetta base paths, skipping ones that are already correct
+        rosetta_base = match.group('base')
+        if rosetta_base != new_rosetta_base:
+            found[rosetta_base] = None
+        return new_rosetta_base
+
+    content = _ROSETTA_RE.sub(_replace, content)
+    for rosetta_base in found:
+        changes.append(f"Rosetta base: {rosetta_base} → {new_rosetta_base}")
+
+    if binary_count > 0:
+        changes.append(f"Rosetta binaries: .default → .static ({binary_count} occurrence(s))")
 
-    count = content.count(old_base)
     if count > 0:
-        content = content.replace(old_base, new_base)
         changes.append(f"General paths: {old_base} → {new_base} ({count} occurrence(s))")
 
-    return content, changes
+    return content
 
 
 # ============================================================================
@@ -155,160 +201,182 @@ def fix_hardcoded_paths(content: str) -> Tuple[str, List[str]]:
 
 def parse_time_to_days(time_str: str) -> float:
     """Parse SLURM time format to days."""
-    if '-' in time_str:
-        days, time_part = time_str.split('-', 1)
-        return int(days)
-    else:
-        parts = time_str.split(':')
-        if len(parts) >= 1:
-            hours = int(parts[0])
-            return hours / 24.0
-    return 0
+    # Only the leading field matters, so slice it off rather than split
+    dash = time_str.find('-')
+    if dash != -1:
+        return int(time_str[:dash])
+    colon = time_str.find(':')
+    hours = int(time_str if colon == -1 else time_str[:colon])
+    return hours / 24.0
 
 
-def fix_slurm_partitions(content: str, use_high_partition: bool = False) -> Tuple[str, List[str]]:
-    """Fix SLURM partition configurations."""
-    changes = []
+def fix_slurm_flags(content: str, changes: List[str], use_high_partition: bool = False) -> str:
+    """Fix SLURM partition configurations and time limits.
+
+    Partitions, accounts and time limits are all fixed in one pass over
+    the lines; the time limit changes are reported last.
+    """
+    # Nothing to fix without #SBATCH lines; skip splitting the whole file
+    if '#SBATCH' not in content:
+        return content
+
     lines = content.split('\n')
     modified_lines = []
 
+    # Indices of #SBATCH lines in modified_lines, so the insertions below
+    # don't have to strip and test every line again
+    sbatch_indices = []
+
     gpu_detected = False
     cpu_partition_target = 'high' if use_high_partition else 'low'
+    production_repl = rf'\1{cpu_partition_target}'
+
+    # What the script contains once partitions are fixed, gathered line by
+    # line so the insertions below need no scan of the whole content
+    has_low_partition = False
+    has_account = False
+    has_requeue = False
+
+    # Time limits are only enforced when the script uses the low partition,
+    # which is known once every line has been seen. Until then, shortened
+    # lines are kept aside as (index, line, change).
+    time_fixes = []
 
     for line in lines:
-        if not line.strip().startswith('#SBATCH'):
-            modified_lines.append(line)
-            continue
-
-        original_line = line
-
-        # Detect GPU partitions
-        if any(gpu_part in line for gpu_part in ['jbsiegel-gpu', 'gpu-a100']):
-            gpu_detected = True
-
-            # Fix old GPU partition name
-            if 'jbsiegel-gpu' in line:
-                line = re.sub(r'--partition=jbsiegel-gpu', '--partition=gpu-a100', line)
-                line = re.sub(r'-p jbsiegel-gpu', '-p gpu-a100', line)
-                if line != original_line:
-                    changes.append("GPU partition: jbsiegel-gpu → gpu-a100")
-
-            # Add account for GPU jobs if missing
-            if 'gpu-a100' in line and '--account=' not in line and '-A ' not in line:
-                line = line + ' --account=genome-center-grp'
-                changes.append("Added GPU account: genome-center-grp")
-
-        # Fix CPU partitions (production → low/high)
-        elif '--partition=production' in line or '-p production' in line:
-            line = re.sub(r'--partition=production', f'--partition={cpu_partition_target}', line)
-            line = re.sub(r'-p production', f'-p {cpu_partition_target}', line)
-            changes.append(f"CPU partition: production → {cpu_partition_target}")
+        if '#SBATCH' in line and line.lstrip().startswith('#SBATCH'):
+            sbatch_indices.append(len(modified_lines))
+
+            # Detect GPU partitions
+            if 'jbsiegel-gpu' in line or 'gpu-a100' in line:
+                gpu_detected = True
+
+                # Fix old GPU partition name
+                if 'jbsiegel-gpu' in line:
+                    line, count = _GPU_PARTITION_RE.subn(r'\1gpu-a100', line)
+                    if count:
+                        changes.append("GPU partition: jbsiegel-gpu → gpu-a100")
+
+                # Add account for GPU jobs if missing
+                if 'gpu-a100' in line and '--account=' not in line and '-A ' not in line:
+                    line = line + ' --account=genome-center-grp'
+                    changes.append("Added GPU account: genome-center-grp")
+
+            # Fix CPU partitions (production → low/high)
+            elif 'production' in line:
+                line, count = _PRODUCTION_PARTITION_RE.subn(production_repl, line)
+                if count:
+                    changes.append(f"CPU partition: production → {cpu_partition_target}")
+
+            # Check for a time specification over the low partition maximum
+            if not use_high_partition:
+                time_match = _TIME_LONG_RE.search(line)
+                if not time_match:
+                    time_match = _TIME_SHORT_RE.search(line)
+
+                if time_match:
+                    time_str = time_match.group(1)
+                    days = parse_time_to_days(time_str)
+
+                    if days > 3:
+                        fixed_line = _TIME_LONG_RE.sub('--time=3-00:00:00', line)
+                        fixed_line = _TIME_SHORT_RE.sub('-t 3-00:00:00', fixed_line)
+                        time_fixes.append((len(modified_lines), fixed_line,
+                                           f"Time limit: {time_str} → 3-00:00:00 (low partition max)"))
+
+        # Flags are taken before time limits are shortened, as when time
+        # limits were fixed in a separate pass afterwards
+        if '--partition=low' in line:
+            has_low_partition = True
+        if '--requeue' in line:
+            has_requeue = True
+        if 'genome-center-grp' in line and ('--account=genome-center-grp' in line or '-A genome-center-grp' in line):
+            has_account = True
 
         modified_lines.append(line)
 
-    content = '\n'.join(modified_lines)
-
-    # Add account line for GPU jobs if needed
-    if gpu_detected and '--account=genome-center-grp' not in content and '-A genome-center-grp' not in content:
-        final_lines = []
-        account_added = False
+    # Add account line after the first gpu-a100 SBATCH line, found before
+    # time limits are shortened
+    account_idx = None
+    if gpu_detected and not has_account:
+        account_idx = next((i for i in sbatch_indices if 'gpu-a100' in modified_lines[i]), None)
 
-        for line in modified_lines:
-            final_lines.append(line)
-            if line.strip().startswith('#SBATCH') and 'gpu-a100' in line and not account_added:
-                final_lines.append('#SBATCH --account=genome-center-grp')
-                changes.append("Added GPU account line: --account=genome-center-grp")
-                account_added = True
+    # Only enforce time limits for low partition
+    time_changes = []
+    if has_low_partition:
+        for i, fixed_line, change in time_fixes:
+            modified_lines[i] = fixed_line
+            time_changes.append(change)
 
-        content = '\n'.join(final_lines)
-        modified_lines = final_lines
+    # Add account line for GPU jobs if needed
+    if account_idx is not None:
+        modified_lines.insert(account_idx + 1, '#SBATCH --account=genome-center-grp')
+        changes.append("Added GPU account line: --account=genome-center-grp")
+        # The new line is at or before the old last SBATCH line + 1, so
+        # either it is the new last one or it shifted the old one down
+        sbatch_indices[-1] += 1
 
     # Add --requeue for low partition if missing
-    if not use_high_partition and '--partition=low' in content and '--requeue' not in content:
-        final_lines = []
-        requeue_added = False
-
-        for i, line in enumerate(modified_lines):
-            final_lines.append(line)
-            if line.strip().startswith('#SBATCH') and not requeue_added:
-                # Add after last SBATCH line
-                has_more_sbatch = any(l.strip().startswith('#SBATCH') for l in modified_lines[i+1:])
-                if not has_more_sbatch:
-                    final_lines.append('#SBATCH --requeue')
-                    changes.append("Added --requeue flag for low partition")
-                    requeue_added = True
-
-        content = '\n'.join(final_lines)
+    if not use_high_partition and has_low_partition and not has_requeue:
+        # Add after last SBATCH line
+        if sbatch_indices:
+            modified_lines.insert(sbatch_indices[-1] + 1, '#SBATCH --requeue')
+            changes.append("Added --requeue flag for low partition")
 
-    return content, changes
+    changes.extend(time_changes)
+    return '\n'.join(modified_lines)
 
 
-def fix_time_limits(content: str, use_high_partition: bool = False) -> Tuple[str, List[str]]:
-    """Adjust time limits based on partition constraints."""
-    changes = []
+# ============================================================================
+# FILE PROCESSING
+# ============================================================================
 
-    # Only enforce time limits for low partition
-    if use_high_partition:
-        return content, changes
+TEXT_EXTENSIONS = frozenset({
+    '.txt', '.py', '.js', '.html', '.css', '.json', '.xml', '.yaml', '.yml',
+    '.md', '.rst', '.csv', '.log', '.ini', '.cfg', '.conf', '.sh', '.bash',
+    '.c', '.cpp', '.h', '.hpp', '.java', '.r', '.R', '.m', '.mat', '.dat',
+    '.sbatch', '.slurm'
+})
 
-    if '--partition=low' not in content:
-        return content, changes
 
-    lines = content.split('\n')
-    modified_lines = []
-    time_adjusted = False
+_Utf8Decoder = codecs.getincrementaldecoder('utf-8')
 
-    for line in lines:
-        if line.strip().startswith('#SBATCH'):
-            # Check for time specification
-            time_match = re.search(r'--time=([^\s]+)', line)
-            if not time_match:
-                time_match = re.search(r'-t\s+([^\s]+)', line)
-
-            if time_match:
-                time_str = time_match.group(1)
-                days = parse_time_to_days(time_str)
-
-                if days > 3:
-                    line = re.sub(r'--time=[^\s]+', '--time=3-00:00:00', line)
-                    line = re.sub(r'-t\s+[^\s]+', '-t 3-00:00:00', line)
-                    time_adjusted = True
-                    changes.append(f"Time limit: {time_str} → 3-00:00:00 (low partition max)")
-
-        modified_lines.append(line)
 
-    return '\n'.join(modified_lines), changes
+@lru_cache(maxsize=256)
+def _mime_for_suffixes(suffixes: str) -> Optional[str]:
+    """Guess the MIME type for a file name ending in these suffixes."""
+    # guess_type only looks at the trailing extensions, so the result is
+    # shared by every file with the same ones
+    return mimetypes.guess_type('x' + suffixes)[0]
 
 
-# ============================================================================
-# FILE PROCESSING
-# ============================================================================
-
-def is_text_file(filepath: Path) -> bool:
-    """Check if a file is a text file."""
-    mime_type, _ = mimetypes.guess_type(str(filepath))
+def is_text_file(name: str, path: str) -> bool:
+    """Check if a file is a text file, given its name and full path."""
+    # Work on the name string; a Path is only built for files that get fixed
+    base = name.lstrip('.')
+    dot = base.find('.')
+    mime_type = _mime_for_suffixes(base[dot:] if dot != -1 else '')
     if mime_type and mime_type.startswith('text'):
         return True
 
-    text_extensions = {
-        '.txt', '.py', '.js', '.html', '.css', '.json', '.xml', '.yaml', '.yml',
-        '.md', '.rst', '.csv', '.log', '.ini', '.cfg', '.conf', '.sh', '.bash',
-        '.c', '.cpp', '.h', '.hpp', '.java', '.r', '.R', '.m', '.mat', '.dat',
-        '.sbatch', '.slurm'
-    }
+    # The last suffix, as Path.suffix computes it
+    dot = name.rfind('.')
+    suffix = name[dot:] if 0 < dot < len(name) - 1 else ''
 
-    if filepath.suffix.lower() in text_extensions:
+    # Suffixes are nearly always lowercase already; lower() only on a miss
+    if suffix in TEXT_EXTENSIONS or suffix.lower() in TEXT_EXTENSIONS:
         return True
 
     # Check for files without extensions (like scripts)
-    if not filepath.suffix:
+    if not suffix:
         try:
-            with open(filepath, 'rb') as f:
+            with open(path, 'rb') as f:
                 chunk = f.read(512)
                 if b'\x00' in chunk:
                     return False
                 try:
-                    chunk.decode('utf-8')
+                    # Not final: the read may end partway through a
+                    # multi-byte character, which is still valid text
+                    _Utf8Decoder().decode(chunk)
                     return True
                 except UnicodeDecodeError:
                     return False
@@ -318,43 +386,61 @@ def is_text_file(filepath: Path) -> bool:
     return False
 
 
-def process_file(filepath: Path, args: argparse.Namespace) -> bool:
-    """Process a single file and apply all fixes."""
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-    except Exception as e:
-        print(f"Error reading file '{filepath}': {e}", file=sys.stderr)
-        return False
-
-    original_content = content
-    all_changes = []
+def apply_fixes(content: str, use_high_partition: bool = False) -> Tuple[str, List[str]]:
+    """Apply every path and SLURM fix to content."""
+    # Every fix appends its changes to this one list
+    changes = []
 
     # Apply all path fixes
-    content, changes = fix_colabfold_paths(content)
-    all_changes.extend(changes)
+    content = fix_colabfold_paths(content, changes)
+    content = fix_ligandmpnn_paths(content, changes)
+    content = fix_rfdiffusion_paths(content, changes)
+    content = fix_rfdiffusion_conda_envs(content, changes)
+    # Also rewrites the hardcoded /share/siegellab/ paths in the same scan
+    content = fix_rosetta_paths(content, changes)
 
-    content, changes = fix_ligandmpnn_paths(content)
-    all_changes.extend(changes)
+    # Apply SLURM fixes
+    content = fix_slurm_flags(content, changes, use_high_partition)
 
-    content, changes = fix_rfdiffusion_paths(content)
-    all_changes.extend(changes)
+    return content, changes
 
-    content, changes = fix_rfdiffusion_conda_envs(content)
-    all_changes.extend(changes)
 
-    content, changes = fix_rosetta_paths(content)
-    all_changes.extend(changes)
+# Identical templates are common in a tree; lru_cache compares the full
+# content on a hit, so only a true repeat reuses a result
+@lru_cache(maxsize=256)
+def apply_fixes_cached(content: str, use_high_partition: bool = False) -> Tuple[str, List[str]]:
+    """apply_fixes, reusing the result for content seen before."""
+    return apply_fixes(content, use_high_partition)
 
-    content, changes = fix_hardcoded_paths(content)
-    all_changes.extend(changes)
 
-    # Apply SLURM fixes
-    content, changes = fix_slurm_partitions(content, args.high)
-    all_changes.extend(changes)
+# Files at least this large are mapped rather than read for the trigger check
+MMAP_MIN_SIZE = 1 << 20
 
-    content, changes = fix_time_limits(content, args.high)
-    all_changes.extend(changes)
+
+def process_file(filepath: Path, args: argparse.Namespace) -> bool:
+    """Process a single file and apply all fixes."""
+    try:
+        with open(filepath, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < MMAP_MIN_SIZE:
+                raw = f.read()
+                # Most files in a directory walk mention none of the triggers
+                if not any(trigger in raw for trigger in _TRIGGERS):
+                    return False
+            else:
+                # Map large files and look for the triggers in place; only
+                # files that mention one are copied into memory
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if all(mm.find(trigger) == -1 for trigger in _TRIGGERS):
+                        return False
+                    raw = mm[:]
+        # Decode and translate line endings as text-mode reading did
+        content = raw.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+    except Exception as e:
+        print(f"Error reading file '{filepath}': {e}", file=sys.stderr)
+        return False
+
+    original_content = content
+    content, all_changes = apply_fixes_cached(content, args.high)
 
     # No changes needed
     if not all_changes:
@@ -366,34 +452,35 @@ def process_file(filepath: Path, args: argparse.Namespace) -> bool:
     else:
         output_filepath = filepath.parent / f"{filepath.stem}_fixed{filepath.suffix}"
 
-    # Show changes
+    # Show changes. Each file's report is gathered and printed at once,
+    # rather than with one write per line.
     if args.dry_run:
-        print(f"\n[DRY RUN] Would modify: {filepath}")
-        for change in all_changes:
-            print(f"  • {change}")
+        report = [f"\n[DRY RUN] Would modify: {filepath}"]
+        report.extend(f"  • {change}" for change in all_changes)
 
         if args.verbose:
             lines = original_content.split('\n')
             new_lines = content.split('\n')
             for i, (old_line, new_line) in enumerate(zip(lines, new_lines), 1):
                 if old_line != new_line:
-                    print(f"  Line {i}:")
-                    print(f"    - {old_line.strip()}")
-                    print(f"    + {new_line.strip()}")
+                    report.append(f"  Line {i}:")
+                    report.append(f"    - {old_line.strip()}")
+                    report.append(f"    + {new_line.strip()}")
 
         if not args.in_place:
-            print(f"  Output would be: {output_filepath}")
+            report.append(f"  Output would be: {output_filepath}")
+        print('\n'.join(report))
     else:
         try:
-            with open(output_filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
+            # Encoded in one shot; the content only ever holds '\n' endings
+            output_filepath.write_bytes(content.encode('utf-8'))
 
-            print(f"\nModified: {filepath}")
-            for change in all_changes:
-                print(f"  • {change}")
+            report = [f"\nModified: {filepath}"]
+            report.extend(f"  • {change}" for change in all_changes)
 
             if not args.in_place:
-                print(f"  → Output: {output_filepath}")
+                report.append(f"  → Output: {output_filepath}")
+            print('\n'.join(report))
 
             return True
         except Exception as e:
@@ -403,30 +490,75 @@ def process_file(filepath: Path, args: argparse.Namespace) -> bool:
     return True
 
 
+# Directories with fewer files than this are processed in this process;
+# for so few files, starting worker processes costs more than it saves
+PARALLEL_MIN_FILES = 4
+
+
+def _process_file_captured(filepath: Path, args: argparse.Namespace) -> Tuple[bool, str, str]:
+    """Process a single file in a worker, returning what it printed."""
+    out, err = io.StringIO(), io.StringIO()
+    with redirect_stdout(out), redirect_stderr(err):
+        modified = process_file(filepath, args)
+    return modified, out.getvalue(), err.getvalue()
+
+
+def _walk_files(top) -> Iterator[os.DirEntry]:
+    """Yield the non-directory entries under top, in os.walk order.
+
+    Entry types come from the directory listing, so no file is stat'ed.
+    Hidden directories are skipped and directory symlinks are not followed.
+    """
+    subdirs = []
+    try:
+        with os.scandir(top) as it:
+            for entry in it:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if not is_dir:
+                    yield entry
+                elif not entry.name.startswith('.') and not entry.is_symlink():
+                    subdirs.append(entry.path)
+    except OSError:
+        return
+    for subdir in subdirs:
+        yield from _walk_files(subdir)
+
+
 def process_path(path: Path, args: argparse.Namespace) -> Tuple[int, int]:
     """Process a file or directory."""
     files_checked = 0
     files_modified = 0
 
     if path.is_file():
-        if is_text_file(path):
+        if is_text_file(path.name, str(path)):
             files_checked = 1
             if process_file(path, args):
                 files_modified = 1
     elif path.is_dir():
-        for root, dirs, files in os.walk(path):
-            # Skip hidden directories
-            dirs[:] = [d for d in dirs if not d.startswith('.')]
-
-            for filename in files:
-                filepath = Path(root) / filename
+        filepaths = [Path(entry.path) for entry in _walk_files(path)
+                     if is_text_file(entry.name, entry.path)]
 
-                if not is_text_file(filepath):
-                    continue
-
-                files_checked += 1
+        files_checked = len(filepaths)
+        if files_checked < PARALLEL_MIN_FILES:
+            for filepath in filepaths:
                 if process_file(filepath, args):
                     files_modified += 1
+        else:
+            # Files are independent, so they are fixed in worker processes.
+            # Each worker's output is captured and printed here in walk
+            # order, so it reads the same as a sequential run.
+            chunksize = max(1, files_checked // (4 * (os.cpu_count() or 1)))
+            with ProcessPoolExecutor() as executor:
+                results = executor.map(_process_file_captured, filepaths,
+                                       repeat(args), chunksize=chunksize)
+                for modified, out, err in results:
+                    sys.stdout.write(out)
+                    sys.stderr.write(err)
+                    if modified:
+                        files_modified += 1
     else:
         print(f"Error: '{path}' is neither a file nor directory", file=sys.stderr)
         sys.exit(1)
@@ -8,9 +8,86 @@ import os
 import sys
 import re
 import argparse
+import difflib
 import mimetypes
+import mmap
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
 
+# Old and new software locations
+OLD_COLABFOLD = "/toolbox/LocalColabFold/localcolabfold/colabfold-conda/bin"
+NEW_COLABFOLD = "/quobyte/jbsiegelgrp/software/LocalColabFold/localcolabfold/colabfold-conda/bin"
+NEW_RFDIFFUSION = '/quobyte/jbsiegelgrp/software/RFdiffusion'
+NEW_SE3NV_ENV = '/quobyte/jbsiegelgrp/software/envs/SE3nv'
+OLD_ROSETTA = '/share/siegellab/software/kschu/Rosetta/main'
+NEW_ROSETTA = '/quobyte/jbsiegelgrp/software/Rosetta_314/rosetta/main'
+OLD_BASE = '/share/siegellab/'
+NEW_BASE = '/quobyte/jbsiegelgrp/'
+
+# RFdiffusion paths - various possible locations
+RFDIFFUSION_PATTERNS = [
+    r'/home/[^/\s]+/RFdiffusion',
+    r'/share/[^/\s]+/[^/\s]+/RFdiffusion',
+    r'/toolbox/RFdiffusion',
+    r'/opt/RFdiffusion',
+    r'/usr/local/RFdiffusion',
+    r'\./RFdiffusion',
+    r'~/RFdiffusion',
+    r'\$HOME/RFdiffusion',
+]
+
+# Every fix as one named alternative, so each file is scanned once. Regex
+# alternation is left-priority, so specific paths come before the general
+# /share/siegellab/ fallback. Files are processed as raw bytes, so the
+# pattern is compiled as bytes.
+_SOFTWARE_FIXES_RE = re.compile('|'.join([
+    rf'(?P<colabfold>{re.escape(OLD_COLABFOLD)})',
+    r'(?P<ligandmpnn>/toolbox/(?P<ligandmpnn_name>[Ll]igand[Mm][Pp][Nn][Nn]))',
+    '(?P<rfdiffusion>' + '|'.join(f'(?:{p})' for p in RFDIFFUSION_PATTERNS) + ')',
+    # Only RFdiffusion-related conda environments not already on the new env
+    rf'(?P<conda>conda\s+activate\s+(?!{re.escape(NEW_SE3NV_ENV)}(?!\S))'
+    r'(?P<conda_env>(?=\S*(?i:se3|rfdiff|rf-diff|diffusion))\S+))',
+    rf'(?P<rosetta>{re.escape(OLD_ROSETTA)})',
+    r'(?P<rosetta_binary>(?P<binary>\w+)\.default\.linuxgccrelease)',
+    rf'(?P<general>{re.escape(OLD_BASE)})',
+]).encode())
+
+# Replacement template for each alternative, keyed by group name
+_REPLACEMENTS = {kind: template.encode() for kind, template in {
+    'colabfold': NEW_COLABFOLD,
+    'ligandmpnn': NEW_BASE + r'\g<ligandmpnn_name>',
+    'rfdiffusion': NEW_RFDIFFUSION,
+    'conda': f'conda activate {NEW_SE3NV_ENV}',
+    'rosetta': NEW_ROSETTA,
+    'rosetta_binary': r'\g<binary>.static.linuxgccrelease',
+    'general': NEW_BASE,
+}.items()}
+
+# Every alternative above contains at least one of these substrings, so a
+# file containing none of them cannot match
+_TRIGGERS = (b'/toolbox/', b'RFdiffusion', b'activate', b'.default.linuxgccrelease', OLD_BASE.encode())
+
+# Group reported in the change summary, where it differs from the whole match
+_REPORT_GROUPS = {
+    'ligandmpnn': 'ligandmpnn_name',
+    'conda': 'conda_env',
+    'rosetta_binary': 'binary',
+}
+
+# Bytes that appear in text files: printable ASCII, common control
+# characters, and everything from 0x80 up (the file(1) heuristic)
+_TEXTCHARS = bytes({7, 8, 9, 10, 12, 13, 27} | set(range(0x20, 0x100)) - {0x7f})
+
+# Binary decisions for extensions outside the whitelist. An extension is
+# cached as binary once its first _EXT_CONSENSUS probed files were all
+# binary; after that, files with it skip the 512-byte read. Text verdicts
+# are never cached, so every file that may be rewritten has been probed.
+_EXT_CONSENSUS = 3
+_EXT_VOTES = {}  # extension -> [text count, binary count]
+_EXT_CACHE = {}
+
 def is_text_file(filepath):
     """Check if a file is a text file."""
     mime_type, _ = mimetypes.guess_type(filepath)
@@ -24,165 +101,233 @@ def is_text_file(filepath):
         '.sbatch', '.slurm'
     }
     
-    if Path(filepath).suffix.lower() in text_extensions:
+    ext = Path(filepath).suffix.lower()
+    if ext in text_extensions:
         return True
     
-    # Check for files without extensions (like scripts)
-    if not Path(filepath).suffix:
-        return True
+    # Files without extensions (like scripts) are always probed
+    if ext and ext in _EXT_CACHE:
+        return _EXT_CACHE[ext]
     
     try:
         with open(filepath, 'rb') as f:
             chunk = f.read(512)
-            if b'\x00' in chunk:
-                return False
-            try:
-                chunk.decode('utf-8')
-                return True
-            except UnicodeDecodeError:
-                return False
+            # Any byte left after deleting text bytes (NUL included) means binary
+            is_text = not chunk.translate(None, _TEXTCHARS)
     except:
         return False
-
-def apply_software_fixes(content, verbose=False):
-    """Apply all software-specific path fixes."""
-    original_content = content
-    changes = []
-    
-    # 1. ColabFold paths
-    old_colabfold = "/toolbox/LocalColabFold/localcolabfold/colabfold-conda/bin"
-    new_colabfold = "/quobyte/jbsiegelgrp/software/LocalColabFold/localcolabfold/colabfold-conda/bin"
-    if old_colabfold in content:
-        content = content.replace(old_colabfold, new_colabfold)
-        changes.append(f"ColabFold: {old_colabfold} → {new_colabfold}")
-    
-    # 2. LigandMPNN paths (case-insensitive)
-    ligandmpnn_pattern = r'/toolbox/([Ll]igand[Mm][Pp][Nn][Nn])'
-    ligandmpnn_matches = re.findall(ligandmpnn_pattern, content)
-    if ligandmpnn_matches:
-        content = re.sub(ligandmpnn_pattern, r'/quobyte/jbsiegelgrp/\1', content)
-        for match in set(ligandmpnn_matches):
-            changes.append(f"LigandMPNN: /toolbox/{match} → /quobyte/jbsiegelgrp/{match}")
     
-    # 3. RFdiffusion paths - various possible locations
-    rfdiffusion_patterns = [
-        (r'/home/[^/\s]+/RFdiffusion', '/quobyte/jbsiegelgrp/software/RFdiffusion'),
-        (r'/share/[^/\s]+/[^/\s]+/RFdiffusion', '/quobyte/jbsiegelgrp/software/RFdiffusion'),
-        (r'/toolbox/RFdiffusion', '/quobyte/jbsiegelgrp/software/RFdiffusion'),
-        (r'/opt/RFdiffusion', '/quobyte/jbsiegelgrp/software/RFdiffusion'),
-        (r'/usr/local/RFdiffusion', '/quobyte/jbsiegelgrp/software/RFdiffusion'),
-        (r'\./RFdiffusion', '/quobyte/jbsiegelgrp/software/RFdiffusion'),
-        (r'~/RFdiffusion', '/quobyte/jbsiegelgrp/software/RFdiffusion'),
-        (r'\$HOME/RFdiffusion', '/quobyte/jbsiegelgrp/software/RFdiffusion'),
-    ]
+    # Extensionless files have nothing in common to cache a decision under
+    if not ext:
+        return is_text
     
-    for pattern, replacement in rfdiffusion_patterns:
-        matches = re.findall(pattern, content)
-        if matches:
-            content = re.sub(pattern, replacement, content)
-            for match in set(matches):
-                changes.append(f"RFdiffusion: {match} → {replacement}")
+    # Cache only a unanimous binary decision; mixed extensions keep being probed
+    votes = _EXT_VOTES.setdefault(ext, [0, 0])
+    votes[0 if is_text else 1] += 1
+    if not is_text and votes[1] >= _EXT_CONSENSUS and not votes[0]:
+        _EXT_CACHE[ext] = False
     
-    # 4. RFdiffusion conda environments
-    # Look for conda activate commands with RFdiffusion-related environments
-    conda_pattern = r'conda\s+activate\s+([^\s\n]+)'
-    conda_matches = re.findall(conda_pattern, content)
+    return is_text
+
+def apply_software_fixes(content, verbose=False):
+    """Apply all software-specific path fixes in a single pass over content (bytes)."""
+    # Most files mention none of the old locations; plain substring checks
+    # rule that out far more cheaply than running the regex
+    if not any(trigger in content for trigger in _TRIGGERS):
+        return content, []
     
-    for match in conda_matches:
-        if any(env_name in match.lower() for env_name in ['se3', 'rfdiff', 'rf-diff', 'diffusion']):
-            old_command = f'conda activate {match}'
-            new_command = 'conda activate /quobyte/jbsiegelgrp/software/envs/SE3nv'
-            content = content.replace(old_command, new_command)
-            changes.append(f"RFdiffusion env: {match} → /quobyte/jbsiegelgrp/software/envs/SE3nv")
+    changes = []
+    # Occurrence counts of each unique match, per fix, in order of appearance
+    found = {kind: {} for kind in _REPLACEMENTS}
     
-    # 5. Rosetta paths
-    old_rosetta = '/share/siegellab/software/kschu/Rosetta/main'
-    new_rosetta = '/quobyte/jbsiegelgrp/software/Rosetta_314/rosetta/main'
-    if old_rosetta in content:
-        content = content.replace(old_rosetta, new_rosetta)
-        changes.append(f"Rosetta: {old_rosetta} → {new_rosetta}")
+    def _replace(match):
+        kind = match.lastgroup
+        key = match.group(_REPORT_GROUPS.get(kind, kind)).decode('utf-8', 'replace')
+        found[kind][key] = found[kind].get(key, 0) + 1
+        return match.expand(_REPLACEMENTS[kind])
     
-    # 6. Rosetta binary names (default to static)
-    rosetta_binary_pattern = r'(\w+)\.default\.linuxgccrelease'
-    rosetta_matches = re.findall(rosetta_binary_pattern, content)
-    if rosetta_matches:
-        for binary in set(rosetta_matches):
-            old_binary = f"{binary}.default.linuxgccrelease"
-            new_binary = f"{binary}.static.linuxgccrelease"
-            content = content.replace(old_binary, new_binary)
-            changes.append(f"Rosetta binary: {old_binary} → {new_binary}")
+    content = _SOFTWARE_FIXES_RE.sub(_replace, content)
     
-    # 7. General path migration (last, so it doesn't interfere with specific paths)
-    old_base = '/share/siegellab/'
-    new_base = '/quobyte/jbsiegelgrp/'
-    if old_base in content:
-        # Count occurrences excluding the ones we already handled
-        temp_content = content.replace(old_rosetta, 'TEMP_ROSETTA_MARKER')
-        count = temp_content.count(old_base)
-        if count > 0:
-            content = content.replace(old_base, new_base)
-            changes.append(f"General paths: {old_base} → {new_base} ({count} occurrences)")
+    # Report in the order the fixes are listed in the help text
+    if found['colabfold']:
+        changes.append(f"ColabFold: {OLD_COLABFOLD} → {NEW_COLABFOLD}")
+    for name in found['ligandmpnn']:
+        changes.append(f"LigandMPNN: /toolbox/{name} → {NEW_BASE}{name}")
+    for old_path in found['rfdiffusion']:
+        changes.append(f"RFdiffusion: {old_path} → {NEW_RFDIFFUSION}")
+    for env in found['conda']:
+        changes.append(f"RFdiffusion env: {env} → {NEW_SE3NV_ENV}")
+    if found['rosetta']:
+        changes.append(f"Rosetta: {OLD_ROSETTA} → {NEW_ROSETTA}")
+    for binary in found['rosetta_binary']:
+        changes.append(f"Rosetta binary: {binary}.default.linuxgccrelease → {binary}.static.linuxgccrelease")
+    if found['general']:
+        count = found['general'][OLD_BASE]
+        changes.append(f"General paths: {OLD_BASE} → {NEW_BASE} ({count} occurrences)")
     
     return content, changes
 
+# Contents larger than this are fixed without caching; they are rarely
+# repeated, and each cached entry keeps a full copy alive in the worker
+_CACHE_MAX_CONTENT = 64 << 10
+
+@lru_cache(maxsize=256)
+def _apply_software_fixes_memo(content):
+    return apply_software_fixes(content)
+
+def apply_software_fixes_cached(content):
+    """apply_software_fixes, reusing the result for content seen before."""
+    if len(content) > _CACHE_MAX_CONTENT:
+        return apply_software_fixes(content)
+    return _apply_software_fixes_memo(content)
+
+def write_atomic(filepath, data):
+    """Replace filepath with data via a temp file, so a failed write never truncates it."""
+    # Write through symlinks to the real file, keeping its permission bits
+    target = os.path.realpath(filepath)
+    mode = os.stat(target).st_mode & 0o7777
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target),
+                               prefix=f".{os.path.basename(target)}.")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp, mode)
+        os.replace(tmp, target)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+# Files at least this large are mapped rather than read for the trigger
+# check; for small scripts a plain read is cheaper than setting up a mapping
+MMAP_MIN_SIZE = 1 << 20
+
 def process_file(filepath, dry_run=False, verbose=False):
-    """Process a single file for path replacements."""
+    """Process a single file for path replacements.
+    
+    Returns (modified, report, error). Nothing is printed here so that
+    files can be processed in worker processes and reported in order.
+    """
+    report = []
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
+        # Work on raw bytes: no decode/encode round trip, and files in any
+        # ASCII-compatible encoding are handled
+        with open(filepath, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < MMAP_MIN_SIZE:
+                content = f.read()
+                if not any(trigger in content for trigger in _TRIGGERS):
+                    return False, report, None
+            else:
+                # Map large files and look for the old locations in place;
+                # only files that mention one are copied into memory
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if all(mm.find(trigger) == -1 for trigger in _TRIGGERS):
+                        return False, report, None
+                    content = mm[:]
         
-        new_content, changes = apply_software_fixes(content, verbose)
+        # Never rewrite binaries that got past is_text_file (whitelisted
+        # extensions such as .mat): the rewrite would shift every offset
+        # after a match. Only NUL-free UTF-8 is treated as text; a decode
+        # error is reported below, as the old text-mode read did.
+        if b'\x00' in content:
+            return False, report, None
+        content.decode('utf-8')
+        
+        # Translate line endings as text-mode reading did: sbatch rejects
+        # scripts with DOS line breaks, so rewritten files always use '\n'.
+        # A file that only differs in its line endings is still left alone.
+        content = content.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+        
+        new_content, changes = apply_software_fixes_cached(content)
+        
+        # Nothing to report or write if the fixes were all no-ops
+        if len(new_content) == len(content) and new_content == content:
+            return False, report, None
         
         if changes:
             if dry_run:
-                print(f"\n[DRY RUN] Would modify: {filepath}")
+                report.append(f"\n[DRY RUN] Would modify: {filepath}")
                 for change in changes:
-                    print(f"  • {change}")
+                    report.append(f"  • {change}")
                 
                 if verbose:
-                    # Show line-by-line changes
-                    lines = content.split('\n')
-                    new_lines = new_content.split('\n')
-                    for i, (old_line, new_line) in enumerate(zip(lines, new_lines)):
-                        if old_line != new_line:
-                            print(f"  Line {i+1}:")
-                            print(f"    - {old_line.strip()}")
-                            print(f"    + {new_line.strip()}")
+                    # Show line-by-line changes. The matcher pairs up changed
+                    # regions even if a fix joined lines, where zip() would
+                    # misalign everything after it.
+                    lines = content.split(b'\n')
+                    new_lines = new_content.split(b'\n')
+                    matcher = difflib.SequenceMatcher(None, lines, new_lines, autojunk=False)
+                    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+                        if tag == 'equal':
+                            continue
+                        if i2 - i1 == j2 - j1:
+                            # Same number of lines: report each pair on its own
+                            hunks = [(i, [lines[i]], [new_lines[j]])
+                                     for i, j in zip(range(i1, i2), range(j1, j2))]
+                        else:
+                            hunks = [(i1, lines[i1:i2], new_lines[j1:j2])]
+                        for i, old_block, new_block in hunks:
+                            report.append(f"  Line {i+1}:")
+                            for old_line in old_block:
+                                report.append(f"    - {old_line.strip().decode('utf-8', 'replace')}")
+                            for new_line in new_block:
+                                report.append(f"    + {new_line.strip().decode('utf-8', 'replace')}")
             else:
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    f.write(new_content)
-                print(f"\nModified: {filepath}")
+                write_atomic(filepath, new_content)
+                report.append(f"\nModified: {filepath}")
                 for change in changes:
-                    print(f"  • {change}")
+                    report.append(f"  • {change}")
             
-            return True
-        return False
+            return True, report, None
+        return False, report, None
         
     except Exception as e:
-        print(f"Error processing {filepath}: {str(e)}", file=sys.stderr)
-        return False
+        return False, report, f"Error processing {filepath}: {str(e)}"
 
-def process_directory(directory, dry_run=False, verbose=False):
-    """Process all files in a directory recursively."""
-    directory = Path(directory)
-    files_modified = 0
-    files_checked = 0
+def find_text_files(directory):
+    """Return all text files under directory, skipping hidden directories."""
+    text_files = []
     
-    for root, dirs, files in os.walk(directory):
-        # Skip hidden directories
-        dirs[:] = [d for d in dirs if not d.startswith('.')]
+    # Walk with os.scandir so file/dir checks use the cached d_type from
+    # the directory read instead of a stat per entry
+    pending = [os.fspath(directory)]
+    while pending:
+        try:
+            entries = os.scandir(pending.pop())
+        except OSError:
+            # Unreadable directory; os.walk skipped these silently too
+            continue
         
-        for filename in files:
-            filepath = os.path.join(root, filename)
-            
-            if not is_text_file(filepath):
-                continue
-            
-            files_checked += 1
-            if process_file(filepath, dry_run, verbose):
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    # Skip hidden directories
+                    if not entry.name.startswith('.'):
+                        pending.append(entry.path)
+                    continue
+                
+                if entry.is_file() and is_text_file(entry.path):
+                    text_files.append(entry.path)
+    
+    return text_files
+
+def process_directory(directory, dry_run=False, verbose=False, jobs=None):
+    """Process all files in a directory recursively, in parallel."""
+    text_files = find_text_files(directory)
+    files_modified = 0
+    
+    # Files are independent, so spread them over worker processes. Results
+    # come back in submission order and are printed from this process.
+    worker = partial(process_file, dry_run=dry_run, verbose=verbose)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for modified, report, error in executor.map(worker, text_files, chunksize=32):
+            if report:
+                print('\n'.join(report))
+            if error:
+                print(error, file=sys.stderr)
+            if modified:
                 files_modified += 1
     
-    return files_checked, files_modified
+    return len(text_files), files_modified
 
 def main():
     parser = argparse.ArgumentParser(
@@ -207,6 +352,7 @@ Examples:
   python pathMigrator.py /path/to/scripts   # Process specific directory
   python pathMigrator.py --dry-run          # Preview changes without modifying
   python pathMigrator.py -v                 # Verbose output with line numbers
+  python pathMigrator.py -j 4               # Limit to 4 parallel workers
 """
     )
     
@@ -226,6 +372,12 @@ Examples:
         action='store_true',
         help='Show detailed line-by-line changes'
     )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=None,
+        help='Number of files to process in parallel (default: all CPUs)'
+    )
     
     args = parser.parse_args()
     
@@ -257,7 +409,8 @@ Examples:
     files_checked, files_modified = process_directory(
         args.directory,
         args.dry_run,
-        args.verbose
+        args.verbose,
+        args.jobs
     )
     
     print(f"\n{'=' * 50}")
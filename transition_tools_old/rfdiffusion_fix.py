@@ -5,73 +5,73 @@ Usage: python rfdiffusion_fix.py <script_filename>
 """
 
 import sys
-import os
 import re
 from pathlib import Path
 
 
+NEW_RFDIFFUSION_PATH = '/quobyte/jbsiegelgrp/software/RFdiffusion'
+
+# Common RFdiffusion path patterns to look for
+RFDIFFUSION_PATTERNS = [
+    # Paths that might contain RFdiffusion
+    r'/home/[^/]+/RFdiffusion',
+    r'/share/[^/]+/[^/]+/RFdiffusion',
+    r'/toolbox/RFdiffusion',
+    r'/opt/RFdiffusion',
+    r'/usr/local/RFdiffusion',
+    r'\./RFdiffusion',  # relative paths
+    r'~/RFdiffusion',
+    r'\$HOME/RFdiffusion',
+    # More generic patterns
+    r'/[^/\s]+/[^/\s]+/RFdiffusion',
+    r'/[^/\s]+/RFdiffusion',
+]
+
+NEW_SE3NV_ENV = '/quobyte/jbsiegelgrp/software/envs/SE3nv'
+
+# RFdiffusion paths and conda activate commands fused into one alternation
+# so the content is scanned once, dispatching on the matched group.
+#
+# conda: activate commands for RFdiffusion-related environments, e.g.
+# "conda activate SE3nv" or "conda activate ~/miniconda3/envs/SE3nv". The
+# environment-name check happens inside the regex, and commands that already
+# use the new environment are not matched. An environment path inside an
+# RFdiffusion install is replaced whole, as a conda environment.
+#
+# rfdiffusion: the new path itself is matched first and left alone;
+# otherwise the generic patterns would match its tail and nest it inside
+# itself.
+_RFDIFFUSION_FIXES_RE = re.compile(
+    rf'(?P<conda>conda\s+activate\s+(?!{re.escape(NEW_SE3NV_ENV)}(?!\S))'
+    r'(?P<env>(?=\S*(?i:se3|rfdiff|rf-diff|diffusion))\S+))'
+    '|(?P<rfdiffusion>' + '|'.join(
+        [re.escape(NEW_RFDIFFUSION_PATH)] + [f'(?:{p})' for p in RFDIFFUSION_PATTERNS]
+    ) + ')'
+)
+
+_OLD_BASE_RE = re.compile(re.escape('/share/siegellab/'))
+
+
 def fix_rfdiffusion_paths(content):
-    """Fix RFdiffusion installation paths."""
+    """Fix RFdiffusion installation paths and conda environment activation commands."""
     changes = []
     
-    # Common RFdiffusion path patterns to look for
-    rfdiffusion_patterns = [
-        # Paths that might contain RFdiffusion
-        r'/home/[^/]+/RFdiffusion',
-        r'/share/[^/]+/[^/]+/RFdiffusion',
-        r'/toolbox/RFdiffusion',
-        r'/opt/RFdiffusion',
-        r'/usr/local/RFdiffusion',
-        r'\./RFdiffusion',  # relative paths
-        r'~/RFdiffusion',
-        r'\$HOME/RFdiffusion',
-        # More generic patterns
-        r'/[^/\s]+/[^/\s]+/RFdiffusion',
-        r'/[^/\s]+/RFdiffusion',
-    ]
-    
-    # New RFdiffusion path
-    new_rfdiffusion_path = '/quobyte/jbsiegelgrp/software/RFdiffusion'
-    
-    # Apply each pattern
-    for pattern in rfdiffusion_patterns:
-        matches = re.findall(pattern, content)
-        if matches:
-            unique_matches = list(set(matches))
-            for match in unique_matches:
-                # Replace the match with the new path
-                content = content.replace(match, new_rfdiffusion_path)
-                changes.append(f"Updated RFdiffusion path: {match} -> {new_rfdiffusion_path}")
+    replaced = {}  # unique old paths, in order of first appearance
+    conda_changes = []
     
-    return content, changes
-
-
-def fix_conda_environments(content):
-    """Fix conda environment activation commands."""
-    changes = []
+    def _replace(match):
+        if match.lastgroup == 'conda':
+            conda_changes.append(f"Updated conda environment: {match.group('env')} -> {NEW_SE3NV_ENV}")
+            return f'conda activate {NEW_SE3NV_ENV}'
+        old_path = match.group(0)
+        if old_path != NEW_RFDIFFUSION_PATH:
+            replaced[old_path] = None
+        return NEW_RFDIFFUSION_PATH
     
-    # Pattern to match conda activate commands with various environments
-    # This will match things like:
-    # conda activate SE3nv
-    # conda activate /path/to/envs/SE3nv
-    # conda activate rfdiffusion
-    # conda activate ~/miniconda3/envs/SE3nv
-    pattern = r'conda\s+activate\s+([^\s\n]+)'
-    
-    # Find all conda activate commands
-    matches = re.findall(pattern, content)
-    
-    # New environment path
-    new_env = '/quobyte/jbsiegelgrp/software/envs/SE3nv'
-    
-    for match in matches:
-        # Check if this looks like it might be an RFdiffusion-related environment
-        # Look for common environment names used with RFdiffusion
-        if any(env_name in match.lower() for env_name in ['se3', 'rfdiff', 'rf-diff', 'diffusion']):
-            old_command = f'conda activate {match}'
-            new_command = f'conda activate {new_env}'
-            content = content.replace(old_command, new_command)
-            changes.append(f"Updated conda environment: {match} -> {new_env}")
+    content = _RFDIFFUSION_FIXES_RE.sub(_replace, content)
+    for old_path in replaced:
+        changes.append(f"Updated RFdiffusion path: {old_path} -> {NEW_RFDIFFUSION_PATH}")
+    changes.extend(conda_changes)
     
     return content, changes
 
@@ -79,41 +79,46 @@ def fix_conda_environments(content):
 def fix_slurm_flags(content):
     """Fix SLURM sbatch flags."""
     changes = []
+    # Nothing to fix without #SBATCH lines; skip splitting the whole file
+    if '#SBATCH' not in content:
+        return content, changes
+    
     lines = content.split('\n')
     modified_lines = []
     
+    # Track what the rewritten content contains as we go, so the account
+    # line decision needs no second pass over the output
+    has_a100 = 'gpu-a100' in content
+    has_account = '--account=genome-center-grp' in content or '-A genome-center-grp' in content
+    first_sbatch_idx = None
+    
     for line in lines:
-        original_line = line
-        
-        # Check if this is an sbatch line
-        if line.strip().startswith('#SBATCH'):
+        # Check if this is an sbatch line; the substring test is cheap and
+        # skips the lstrip() copy for the many lines that are not
+        if '#SBATCH' in line and line.lstrip().startswith('#SBATCH'):
+            if first_sbatch_idx is None:
+                first_sbatch_idx = len(modified_lines)
+            
             # Fix partition
             if '--partition=jbsiegel-gpu' in line or '-p jbsiegel-gpu' in line:
-                line = re.sub(r'--partition=jbsiegel-gpu', '--partition=gpu-a100', line)
-                line = re.sub(r'-p jbsiegel-gpu', '-p gpu-a100', line)
+                line = line.replace('--partition=jbsiegel-gpu', '--partition=gpu-a100')
+                line = line.replace('-p jbsiegel-gpu', '-p gpu-a100')
                 changes.append(f"Updated partition: jbsiegel-gpu -> gpu-a100")
+                has_a100 = True
             
             # Add account if not present and this is a partition line for gpu-a100
             if ('--partition=gpu-a100' in line or '-p gpu-a100' in line) and '--account=' not in line and '-A ' not in line:
                 # Add account flag to the line
                 line = line + ' --account=genome-center-grp'
                 changes.append("Added SLURM account: genome-center-grp")
+                has_account = True
         
         modified_lines.append(line)
     
-    # Check if we need to add account line for gpu-a100 partitions
-    content_check = '\n'.join(modified_lines)
-    if 'gpu-a100' in content_check and '--account=genome-center-grp' not in content_check and '-A genome-center-grp' not in content_check:
-        # Find the first #SBATCH line and add account after it
-        final_lines = []
-        account_added = False
-        for line in modified_lines:
-            final_lines.append(line)
-            if line.strip().startswith('#SBATCH') and not account_added:
-                final_lines.append('#SBATCH --account=genome-center-grp')
-                changes.append("Added SLURM account line: --account=genome-center-grp")
-                account_added = True
-        modified_lines = final_lines
+    # Add account line after the first #SBATCH line for gpu-a100 partitions
+    if has_a100 and not has_account and first_sbatch_idx is not None:
+        modified_lines.insert(first_sbatch_idx + 1, '#SBATCH --account=genome-center-grp')
+        changes.append("Added SLURM account line: --account=genome-center-grp")
     
     return '\n'.join(modified_lines), changes
 
@@ -126,27 +131,24 @@ def fix_hardcoded_paths(content):
     old_base = '/share/siegellab/'
     new_base = '/quobyte/jbsiegelgrp/'
     
-    # Count occurrences for reporting
-    count = content.count(old_base)
+    # Simple replacement - this preserves everything after the base path.
+    # subn counts as it replaces, so the content is scanned once.
+    content, count = _OLD_BASE_RE.subn(new_base, content)
     if count > 0:
         changes.append(f"Updated {count} occurrence(s) of {old_base} to {new_base}")
     
-    # Simple replacement - this preserves everything after the base path
-    content = content.replace(old_base, new_base)
-    
     return content, changes
 
 
 def process_script(filename):
     """Process the script file and apply all fixes."""
-    if not os.path.exists(filename):
-        print(f"Error: File '{filename}' not found.")
-        return False
-    
     # Read the original file
     try:
         with open(filename, 'r') as f:
             original_content = f.read()
+    except FileNotFoundError:
+        print(f"Error: File '{filename}' not found.")
+        return False
     except Exception as e:
         print(f"Error reading file '{filename}': {e}")
         return False
@@ -154,13 +156,10 @@ def process_script(filename):
     content = original_content
     all_changes = []
     
-    # Apply all fixes
+    # Apply all fixes; paths and conda environments share one scan
     content, rfdiffusion_changes = fix_rfdiffusion_paths(content)
     all_changes.extend(rfdiffusion_changes)
     
-    content, conda_changes = fix_conda_environments(content)
-    all_changes.extend(conda_changes)
-    
     content, slurm_changes = fix_slurm_flags(content)
     all_changes.extend(slurm_changes)
     
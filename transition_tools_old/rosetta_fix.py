@@ -14,162 +14,203 @@ Features:
 """
 
 import sys
-import os
 import re
 from pathlib import Path
 
+NEW_ROSETTA_BASE = b'/quobyte/jbsiegelgrp/software/Rosetta_314/rosetta/main'
+
+# Patterns applied to every script, compiled once at import. Scripts are
+# processed as bytes, since every pattern and replacement is ASCII. The Rosetta
+# base path, binary, partition and /share/siegellab/ rewrites never overlap,
+# so they share one alternation and the content is scanned once, dispatching
+# on the group. A base path under /share/siegellab/ is tried first and wins.
+# In the old base path, the optional old_rosetta group marks the old Rosetta
+# install, which is rewritten like any other path but not counted as a
+# hardcoded path.
+_ROSETTA_FIXES_RE = re.compile(
+    rb'(?P<base>/[^ \t\n]+/[Rr]osetta[^ \t\n]*/main)'
+    rb'|(?P<binary>\.default\.linuxgccrelease)'
+    rb'|(?P<partition>#SBATCH\s+--partition=)\S+'
+    rb'|(?P<share>/share/siegellab/(?P<old_rosetta>software/kschu/Rosetta)?)'
+)
+# Old partition names in either "--partition=X" or "-p X" spelling
+_OLD_PARTITION_RE = re.compile(rb'(--partition=|-p )(production|jbsiegel-gpu|gpu-a100)')
+# A whole #SBATCH line; leading whitespace may not run across lines
+_SBATCH_LINE_RE = re.compile(rb'^[^\S\n]*#SBATCH.*', re.MULTILINE)
+_TIME_LONG_RE = re.compile(rb'--time=([^\s]+)')
+_TIME_SHORT_RE = re.compile(rb'-t\s+([^\s]+)')
+
 # --- Fix functions ---
 
 def fix_rosetta_jobfile(content):
-    """Normalize Rosetta paths, binaries, and SLURM flags."""
-    changes = []
-    rosetta_base_pattern = r'(/[^ \t\n]+/[Rr]osetta[^ \t\n]*/main)'
-    new_rosetta_base = '/quobyte/jbsiegelgrp/software/Rosetta_314/rosetta/main'
+    """Normalize Rosetta paths, binaries, SLURM flags and hardcoded paths.
 
-    matches = re.findall(rosetta_base_pattern, content)
-    unique_matches = set(matches)
-    for old_base in unique_matches:
-        content = content.replace(old_base, new_rosetta_base)
-        changes.append(f"Updated base path: {old_base} -> {new_rosetta_base}")
+    Returns (content, changes, hardcoded_changes); the hardcoded path
+    changes are kept apart so they can be reported last.
+    """
+    changes = []
+    hardcoded_changes = []
+    old_base = '/share/siegellab/'
+    new_base = b'/quobyte/jbsiegelgrp/'
+    found = {}  # unique old base paths, in order of first appearance
+    n1 = n2 = n3 = 0
+
+    def _replace(match):
+        nonlocal n1, n2, n3
+        kind = match.lastgroup
+        if kind == 'share':
+            # Replace hardcoded /share/siegellab/ paths
+            rosetta = match.group('old_rosetta')
+            if rosetta is None:
+                n3 += 1
+                return new_base
+            return new_base + rosetta
+        if kind == 'base':
+            base = match.group('base')
+            if base != NEW_ROSETTA_BASE:
+                found[base] = None
+            return NEW_ROSETTA_BASE
+        if kind == 'binary':
+            # Replace .default.linuxgccrelease with .static.linuxgccrelease
+            n1 += 1
+            return b'.static.linuxgccrelease'
+        # Partition: from production to low
+        n2 += 1
+        return match.group('partition') + b'low'
+
+    content = _ROSETTA_FIXES_RE.sub(_replace, content)
+    for base in found:
+        changes.append(f"Updated base path: {base.decode('utf-8', 'replace')} -> {NEW_ROSETTA_BASE.decode()}")
 
-    # Replace .default.linuxgccrelease with .static.linuxgccrelease
-    content, n1 = re.subn(r'\.default\.linuxgccrelease', '.static.linuxgccrelease', content)
     if n1 > 0:
         changes.append(f"Updated {n1} binaries from 'default' to 'static'")
 
-    # Partition: from production to low
-    content, n2 = re.subn(r'(#SBATCH\s+--partition=)\S+', r'\1low', content)
     if n2 > 0:
         changes.append("Updated --partition= to 'low'")
 
     # Add --requeue if missing
-    if "--requeue" not in content:
-        content = content.replace("#SBATCH --partition=low",
-                                  "#SBATCH --partition=low\n#SBATCH --requeue")
+    if b"--requeue" not in content:
+        content = content.replace(b"#SBATCH --partition=low",
+                                  b"#SBATCH --partition=low\n#SBATCH --requeue")
         changes.append("Added --requeue flag")
 
-    return content, changes
+    if n3 > 0:
+        hardcoded_changes.append(f"Updated {n3} occurrence(s) of {old_base} to {new_base.decode()}")
+
+    return content, changes, hardcoded_changes
 
 
 def parse_time_to_days(time_str):
     """Parse SLURM time format to days."""
-    if '-' in time_str:
-        days, time_part = time_str.split('-', 1)
-        return int(days)
-    else:
-        parts = time_str.split(':')
-        if len(parts) >= 1:
-            hours = int(parts[0])
-            return hours / 24.0
-    return 0
+    # Only the leading field matters, so slice it off rather than split
+    dash = time_str.find('-')
+    if dash != -1:
+        return int(time_str[:dash])
+    colon = time_str.find(':')
+    hours = int(time_str if colon == -1 else time_str[:colon])
+    return hours / 24.0
 
 
 def fix_slurm_flags(content, use_high_partition=False):
     """Fix SLURM sbatch flags for Rosetta (CPU-only jobs)."""
     changes = []
-    lines = content.split('\n')
-    modified_lines = []
-    requeue_added = False
+    # Nothing to fix without #SBATCH lines; skip scanning the whole file
+    if b'#SBATCH' not in content:
+        return content, changes, False
+
     time_adjusted = False
+    last_sbatch_end = None  # end of the last #SBATCH line in the output
+    growth = 0  # how much longer the output is than content so far
 
     target_partition = 'high' if use_high_partition else 'low'
-
-    for line in lines:
-        if line.strip().startswith('#SBATCH'):
-            if '--partition=production' in line or '-p production' in line:
-                line = re.sub(r'--partition=production', f'--partition={target_partition}', line)
-                line = re.sub(r'-p production', f'-p {target_partition}', line)
-                changes.append(f"Updated partition: production -> {target_partition}")
-
-            elif '--partition=jbsiegel-gpu' in line or '-p jbsiegel-gpu' in line:
-                line = re.sub(r'--partition=jbsiegel-gpu', f'--partition={target_partition}', line)
-                line = re.sub(r'-p jbsiegel-gpu', f'-p {target_partition}', line)
-                changes.append("Updated GPU partition -> Rosetta is CPU-only")
-
-            elif '--partition=gpu-a100' in line or '-p gpu-a100' in line:
-                line = re.sub(r'--partition=gpu-a100', f'--partition={target_partition}', line)
-                line = re.sub(r'-p gpu-a100', f'-p {target_partition}', line)
-                changes.append("Updated A100 GPU partition -> Rosetta is CPU-only")
-
-            elif (time_match := re.search(r'--time=([^\s]+)', line)
-                    or re.search(r'-t\s+([^\s]+)', line)):
-                if target_partition == 'low':
-                    time_str = time_match.group(1)
-                    days = parse_time_to_days(time_str)
-                    if days > 3:
-                        line = re.sub(r'--time=[^\s]+', '--time=3-00:00:00', line)
-                        line = re.sub(r'-t\s+[^\s]+', '-t 3-00:00:00', line)
-                        time_adjusted = True
-                        changes.append("Adjusted time limit to 3 days (low partition max)")
-
-        modified_lines.append(line)
-
-    # Add --requeue if needed
-    if target_partition == 'low':
-        content_check = '\n'.join(modified_lines)
-        if '--requeue' not in content_check:
-            final_lines = []
-            for i, line in enumerate(modified_lines):
-                final_lines.append(line)
-                if line.strip().startswith('#SBATCH') and not requeue_added:
-                    has_more_sbatch = any(l.strip().startswith('#SBATCH') for l in modified_lines[i+1:])
-                    if not has_more_sbatch:
-                        final_lines.append('#SBATCH --requeue')
-                        changes.append("Added --requeue flag for low partition")
-                        requeue_added = True
-            modified_lines = final_lines
-
-    return '\n'.join(modified_lines), changes, time_adjusted
-
-
-def fix_hardcoded_paths(content):
-    """Replace hardcoded paths from /share/siegellab/ to /quobyte/jbsiegelgrp/."""
-    changes = []
-    old_base = '/share/siegellab/'
-    new_base = '/quobyte/jbsiegelgrp/'
-
-    temp_content = content.replace('/share/siegellab/software/kschu/Rosetta', 'TEMP_ROSETTA_MARKER')
-    count = temp_content.count(old_base)
-
-    if count > 0:
-        changes.append(f"Updated {count} occurrence(s) of {old_base} to {new_base}")
-
-    content = content.replace(old_base, new_base)
-    return content, changes
+    partition_changes = {
+        b'production': f"Updated partition: production -> {target_partition}",
+        b'jbsiegel-gpu': "Updated GPU partition -> Rosetta is CPU-only",
+        b'gpu-a100': "Updated A100 GPU partition -> Rosetta is CPU-only",
+    }
+    retargeted = []  # old partition names rewritten on the current line
+
+    def _retarget(match):
+        retargeted.append(match.group(2))
+        return match.group(1) + target_partition.encode()
+
+    def _fix_line(match):
+        nonlocal time_adjusted, last_sbatch_end, growth
+        line = match.group(0)
+
+        # One scan rewrites whichever old partition the line names
+        retargeted.clear()
+        line = _OLD_PARTITION_RE.sub(_retarget, line)
+        if retargeted:
+            changes.append(partition_changes[retargeted[0]])
+        elif (time_match := _TIME_LONG_RE.search(line)
+                or _TIME_SHORT_RE.search(line)):
+            if target_partition == 'low':
+                time_str = time_match.group(1).decode('utf-8', 'replace')
+                days = parse_time_to_days(time_str)
+                if days > 3:
+                    line = _TIME_LONG_RE.sub(b'--time=3-00:00:00', line)
+                    line = _TIME_SHORT_RE.sub(b'-t 3-00:00:00', line)
+                    time_adjusted = True
+                    changes.append("Adjusted time limit to 3 days (low partition max)")
+
+        growth += len(line) - len(match.group(0))
+        last_sbatch_end = match.end() + growth
+        return line
+
+    # Only #SBATCH lines are visited; the rest of the content is copied as is
+    new_content = _SBATCH_LINE_RE.sub(_fix_line, content)
+
+    # Add --requeue after the last #SBATCH line if needed. The rewrites
+    # above never touch --requeue, so checking the input is enough.
+    if target_partition == 'low' and b'--requeue' not in content and last_sbatch_end is not None:
+        new_content = (new_content[:last_sbatch_end] + b'\n#SBATCH --requeue'
+                       + new_content[last_sbatch_end:])
+        changes.append("Added --requeue flag for low partition")
+
+    return new_content, changes, time_adjusted
 
 
 # --- Main file processor ---
 
 def process_script(filename, use_high_partition=False):
     """Process the script file and apply all fixes."""
-    if not os.path.exists(filename):
-        print(f"Error: File '{filename}' not found.")
-        return False
-
     try:
-        with open(filename, 'r') as f:
+        with open(filename, 'rb') as f:
             original_content = f.read()
+    except FileNotFoundError:
+        print(f"Error: File '{filename}' not found.")
+        return False
     except Exception as e:
         print(f"Error reading file '{filename}': {e}")
         return False
 
-    content = original_content
+    # Translate line endings as text-mode reading did: sbatch rejects
+    # scripts with DOS line breaks, so the output always uses '\n'
+    content = original_content.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
     all_changes = []
 
-    content, rosetta_changes = fix_rosetta_jobfile(content)
+    # Path, binary and /share/siegellab/ rewrites share one scan; the
+    # SLURM line fixes never touch paths, so they can run afterwards
+    content, rosetta_changes, hardcoded_changes = fix_rosetta_jobfile(content)
     all_changes.extend(rosetta_changes)
 
     content, slurm_changes, time_adjusted = fix_slurm_flags(content, use_high_partition)
     all_changes.extend(slurm_changes)
 
-    content, hardcoded_changes = fix_hardcoded_paths(content)
     all_changes.extend(hardcoded_changes)
 
+    # Nothing to write when the fixes left the script as it was
+    if content == original_content:
+        print(f"\n=== Processed {filename} ===")
+        print("  No changes were needed. No output file written.")
+        return True
+
     path = Path(filename)
     output_filename = str(path.parent / f"{path.stem}_fixed{path.suffix}")
 
     try:
-        with open(output_filename, 'w') as f:
+        with open(output_filename, 'wb') as f:
             f.write(content)
     except Exception as e:
         print(f"Error writing file '{output_filename}': {e}")